@@ -20,7 +20,9 @@ __geotiff__ = (1, 8, 1)
 
 import io
 import os
+import array
 import sys
+import mmap
 import struct
 import operator
 
@@ -31,7 +33,7 @@ __XMP__ = True
 
 class InvalidFileError(Exception):
   """
-  Raise when the input file is not valid, e.g. not a tiff or jpeg, or is a bigtiff
+  Raise when the input file is not valid, e.g. not a tiff or jpeg
   """
   pass
 
@@ -50,6 +52,16 @@ TYPES = {
     10: ("ll", "RATIONAL"),
     11: ("f",  "FLOAT"),
     12: ("d",  "DOUBLE"),
+    16: ("Q",  "ULONG8"),
+    17: ("q",  "SLONG8"),
+    18: ("Q",  "IFD8"),
+}
+
+#: IFD structure definition linking BigTIFF flag to python `struct` formats
+#: of entry count, IFD entry (tag, type, count) and offset
+IFD_FORMATS = {
+    False: ("H", "HHL", "L"),
+    True:  ("Q", "HHQ", "Q"),
 }
 
 # assure compatibility python 2 & 3
@@ -64,187 +76,520 @@ else:
     from cStringIO import StringIO
     reduce = __builtins__["reduce"]
 
+#: Array typecodes of numeric tag types, matching their `struct` item size
+ARRAY_TYPES = dict(
+    (typ, [
+        code for code in fmt[0] + {"L": "I", "l": "i"}.get(fmt[0], "")
+        if array.array(code).itemsize == struct.calcsize("=" + fmt[0])
+    ][-1]) for typ, (fmt, desc) in TYPES.items() if fmt[0] not in "sc"
+)
+
+# compiled struct cache by format or by (byteorder, type, count)
+_STRUCTS = {}
+
+
+def _compiled(fmt):
+    "Return compiled struct of a format, creating it on first use."
+    try:
+        return _STRUCTS[fmt]
+    except KeyError:
+        # do not let cache grow with all possible value counts
+        if len(_STRUCTS) > 4096:
+            _STRUCTS.clear()
+        return _STRUCTS.setdefault(fmt, struct.Struct(fmt))
+
+
+def _value_struct(byteorder, typ, count):
+    "Return compiled struct for `count` values of tag type `typ`."
+    try:
+        return _STRUCTS[(byteorder, typ, count)]
+    except KeyError:
+        _typ = TYPES[typ][0]
+        return _STRUCTS.setdefault(
+            (byteorder, typ, count), _compiled(
+                byteorder + (
+                    "%ds" % count if _typ == "s" else
+                    "%d%s" % (count * len(_typ), _typ[0])
+                )
+            )
+        )
+
+
+def _entry_struct(byteorder, bigtiff=False):
+    "Return compiled struct of IFD entry (tag, type, count, value_or_offset)."
+    _cnt, _entry, _ofs = IFD_FORMATS[bigtiff]
+    return _compiled(
+        byteorder + _entry + "%ds" % _compiled("=" + _ofs).size
+    )
+
+
+def _iter_unpack(fmt, buffer):
+    "Return iterator over `buffer` unpacked with compiled struct `fmt`."
+    if hasattr(fmt, "iter_unpack"):
+        return fmt.iter_unpack(buffer)
+    # python 2.x
+    return (
+        fmt.unpack_from(buffer, offset)
+        for offset in range(0, len(buffer), fmt.size)
+    )
+
+
+def _table(name):
+    "Return `Tyf.values` table of a tag, the module being loaded on first use."
+    from Tyf import values
+    return getattr(values, name, {})
+
+
 # here to avoid circular import
-from Tyf import ifd, gkd, tags
+from Tyf import ifd, tags
 
 
 def unpack(fmt, fileobj):
-    return struct.unpack(fmt, fileobj.read(struct.calcsize(fmt)))
+    fmt = _compiled(fmt)
+    return fmt.unpack(fileobj.read(fmt.size))
 
 
 def pack(fmt, fileobj, value):
-    return fileobj.write(struct.pack(fmt, *value))
+    return fileobj.write(_compiled(fmt).pack(*value))
 
 
-def _read_IFD(obj, fileobj, offset, byteorder="<", db=None):
+def _read_IFD(
+    obj, fileobj, offset, byteorder="<", db=None, lazy=False, bigtiff=False
+):
     "Read IFD from file object and return next IFD offset."
+    _cnt, _entry, _ofs = IFD_FORMATS[bigtiff]
     # fileobj seek must be on the start offset
     fileobj.seek(offset)
     # get number of entry
-    nb_entry, = unpack(byteorder+"H", fileobj)
-    next_ifd_offset = offset + struct.calcsize("=H" + nb_entry*"HHLL")
-    # for each entry
-    for i in range(nb_entry):
-        obj.append(ifd.Tag.read(fileobj, byteorder, db=db))
-    # return next ifd offset, if =0 then end of TIFF
-    return next_ifd_offset
+    nb_entry, = unpack(byteorder+_cnt, fileobj)
+    # read the whole entry table at once or use memory map directly
+    entry_struct = _entry_struct(byteorder, bigtiff)
+    start = offset + _compiled("=" + _cnt).size
+    next_ifd_offset = start + nb_entry * entry_struct.size
+    if isinstance(fileobj, mmap.mmap):
+        table = memoryview(fileobj)[start:next_ifd_offset]
+    else:
+        table = fileobj.read(nb_entry * entry_struct.size)
+    # decode all entries in one call
+    entries = list(_iter_unpack(entry_struct, table))
+    if lazy:
+        source = getattr(fileobj, "name", fileobj)
+        for entry in entries:
+            obj._register(entry, source, byteorder)
+    else:
+        for entry in entries:
+            obj.append(ifd.Tag.from_entry(entry, byteorder, fileobj))
+    # return next ifd offset, if =0 then end of TIFF, and raw entries
+    return next_ifd_offset, entries
 
 
-def _from_buffer(obj, fileobj, offset, byteorder="<"):
+def _from_buffer(
+    obj, fileobj, offset, byteorder="<", lazy=False, bigtiff=False
+):
     "Read IFD and sub IFD from file object and return next IFD offset."
-    # read data from offset and get next ifd offset
-    next_ifd_offset = _read_IFD(obj, fileobj, offset, byteorder)
+    # read data from offset and get next ifd offset, IFD location and
+    # entries are kept for in place update
+    next_ifd_offset, entries = _read_IFD(
+        obj, fileobj, offset, byteorder, lazy=lazy, bigtiff=bigtiff
+    )
+    obj._table = (offset, entries)
     # read sub IFD if any
-    for key in set(["GPS IFD", "Exif IFD", "Interoperability IFD"]) \
-            & set(obj.keys()):
-        dic = getattr(
-            tags,
-            "gpsT" if "GPS" in key else
-            "exfT" if "Exif" in key else
+    for key in [
+        k for k in ["GPS IFD", "Exif IFD", "Interoperability IFD"]
+        if k in obj
+    ]:
+        name = \
+            "gpsT" if "GPS" in key else \
+            "exfT" if "Exif" in key else \
             "itrT"
-        )
-        _read_IFD(
-            obj, fileobj, obj[key], byteorder,
-            db=dict([(i[0], i[-1][0]) for i in dic.items()])
-        )
+        dic = getattr(tags, name)
+        sub_ifd_offset = obj[key]
+        entries = _read_IFD(
+            obj, fileobj, sub_ifd_offset, byteorder,
+            db=dict([(i[0], i[-1][0]) for i in dic.items()]), lazy=lazy,
+            bigtiff=bigtiff
+        )[-1]
+        if hasattr(obj, name):
+            getattr(obj, name)._table = (sub_ifd_offset, entries)
     fileobj.seek(next_ifd_offset)
-    next_ifd, = unpack(byteorder+"L", fileobj)
+    next_ifd, = unpack(byteorder+IFD_FORMATS[bigtiff][-1], fileobj)
     return next_ifd
 
 
-def _write_IFD(obj, fileobj, offset, byteorder="<", ifd1=None):
-    "Write IFD in file object and return next ifd offset."
-    # compute geotiff ifd if any found
-    geokey = gkd.Gkd.from_ifd(obj)
+def _sizeof(obj, bigtiff=False):
+    "Return packed IFD size, entries and out-of-line values included."
+    _cnt, _entry, _ofs = IFD_FORMATS[bigtiff]
+    field = _compiled("=" + _ofs).size
+    sizes = [tag.calcsize() for tag in obj.values()]
+    return \
+        _compiled("=" + _cnt).size + \
+        len(sizes) * _entry_struct("=", bigtiff).size + field + \
+        sum(size for size in sizes if size > field)
+
+
+def _pack_IFD(obj, offset, byteorder="<", bigtiff=False, next_ifd=0):
+    "Return packed IFD entries followed by out-of-line values."
+    _cnt, _entry, _ofs = IFD_FORMATS[bigtiff]
+    _ofs = _compiled(byteorder + _ofs)
+    tags = [
+        t.pack(byteorder, bigtiff) for t in
+        sorted(obj.values(), key=lambda e: e.tag)
+    ]
+    # out-of-line values follow IFD entries and next IFD offset
+    data_offset = \
+        offset + _compiled("=" + _cnt).size + \
+        len(tags) * _entry_struct("=", bigtiff).size + _ofs.size
+    table, data = [_compiled(byteorder + _cnt).pack(len(tags))], []
+    for entry, value, is_offset in tags:
+        table.append(entry)
+        if is_offset:
+            table.append(_ofs.pack(data_offset))
+            data.append(value)
+            data_offset += len(value)
+        else:
+            table.append(value)
+    table.append(_ofs.pack(next_ifd))
+    return b"".join(table + data)
+
+
+def _write_gkd(obj):
+    # GeoTIFF tags are computed again only if GeoKeys were modified
+    geokey = getattr(obj, "_gkd", None)
+    if geokey is None or not geokey.dirty:
+        return
     if len(geokey):
         geokey.compute()
-        obj["GeoKeyDirectoryTag"] = geokey._34735
-        obj["GeoDoubleParamsTag"] = geokey._34736
-        obj["GeoAsciiParamsTag"] = geokey._34737
-
-    # pack the ifd
-    ifds = obj.pack(byteorder)
-    if isinstance(ifd1, ifd.Ifd):
-        ifds.update(ifd1=ifd1.pack(byteorder)["root"])
-
-    # compute exif, gps and interoperability offsets
-    ifd_size = ifds["root"]["size"]
-    ifd_values = ifds["root"]["data"]
-
-    # where to put ifd values
-    ifd_offset_values = offset + ifd_size
-    # where to put the sub ifds
-    sub_ifd_offset = ifd_offset_values + len(ifd_values)
-
-    # compute all possible sub ifd offsets
-    for name in [n for n in ["exfT", "gpsT", "itrT"] if n in ifds]:
-        i = ifds[name]
-        tag = \
-            "Exif IFD" if name == "exfT" else \
-            "GPS IFD" if name == "gpsT" else \
-            "Interoperability IFD"
-        obj[tag] = sub_ifd_offset
-        # increment the next sub ifd offset
-        sub_ifd_offset += i["size"] + len(i["data"])
-
-    # if ifd1 given (thumbnail jor Jpeg), reserve needed space before raster
-    # data
-    if "ifd1" in ifds:
-        raster_offset = \
-            sub_ifd_offset + ifds["ifd1"]["size"] + \
-            len(ifds["ifd1"]["data"]) + ifds["ifd1"]["raster"]
-    # else raster data can follow the last sub ifd
+        for key, value in [
+            ("GeoKeyDirectoryTag", geokey._34735),
+            ("GeoDoubleParamsTag", geokey._34736),
+            ("GeoAsciiParamsTag", geokey._34737)
+        ]:
+            if len(value):
+                obj[key] = value
+            else:
+                obj.pop(key)
     else:
-        raster_offset = sub_ifd_offset
+        for key in ["GeoKeyDirectoryTag", "GeoDoubleParamsTag",
+                    "GeoAsciiParamsTag"]:
+            obj.pop(key)
+    # setting GeoTIFF tags drops the directory, it is still valid
+    geokey.dirty = False
+    obj._gkd = geokey
+
+
+def _plan_IFD(
+    obj, offset, byteorder="<", ifd1=None, bigtiff=False, last=True,
+    raster_offset=None
+):
+    """
+    Compute layout of IFD written from `offset`: IFD, sub IFD, thumbnail IFD
+    (`ifd1`, only used with Jpeg exif) and raster data. All offsets are set
+    before anything is packed so data is written sequentially once. If
+    `raster_offset` is given, raster data are expected there and are not
+    part of the chunks.
+
+    Returns:
+        next IFD offset and iterator over data chunks to write
+    """
+    _cnt, _entry, _ofs = IFD_FORMATS[bigtiff]
+    _write_gkd(obj)
+
+    # source raster layout has to be known before offsets are recomputed,
+    # JPEG interchange data are small enough to be loaded
+    obj._raster_layout()
+    if "JPEGInterchangeFormat" in obj and not hasattr(obj, "jpegIF") and \
+       hasattr(obj, "_source"):
+        with obj._source_file() as source:
+            obj.jpegIF = ifd._read_at(
+                source, obj["JPEGInterchangeFormat"],
+                obj["JPEGInterchangeFormatLength"]
+            )
+
+    # 64-bit types are not allowed in classic TIFF
+    if not bigtiff:
+        for tag in [t for t in obj.tags() if t.type in [16, 17, 18]]:
+            tag.type = 9 if tag.type == 17 else 4
+    # offsets are LONG in classic TIFF, LONG8 or IFD8 in BigTIFF
+    for key in [
+        k for k in [
+            "StripOffsets", "TileOffsets", "FreeOffsets",
+            "JPEGInterchangeFormat"
+        ] if k in obj
+    ]:
+        obj.get(key).type = 4 if not bigtiff else 16
+    # sub IFD offset tags are needed to size the IFD
+    subs = []
+    for name, key in [
+        ("exfT", "Exif IFD"), ("gpsT", "GPS IFD"),
+        ("itrT", "Interoperability IFD")
+    ]:
+        if hasattr(obj, name):
+            obj.set(key, 18 if bigtiff else 4, 0)
+            subs.append((getattr(obj, name), key))
+        elif key in obj:
+            obj.pop(key)
+
+    # sizing pass: IFD values follow the IFD, then come sub IFD, thumbnail
+    # IFD and raster data, every IFD being on a word boundary
+    position = offset + _sizeof(obj, bigtiff)
+    sub_ifds = []
+    for sub, key in subs:
+        position += position % 2
+        obj[key] = position
+        sub_ifds.append((sub, position))
+        position += _sizeof(sub, bigtiff)
+    if isinstance(ifd1, ifd.Ifd):
+        position += position % 2
+        ifd1_offset = position
+        position, ifd1_chunks = _plan_IFD(
+            ifd1, ifd1_offset, byteorder, None, bigtiff
+        )
+    # raster data follow IFD unless caller writes them elsewhere
+    inline = raster_offset is None
+    if inline:
+        raster_offset = position
 
     # compute raster positions
+    raster_size = 0
     for tag in [
         t for t in
         ["StripOffsets", "TileOffsets", "FreeOffsets", "JPEGInterchangeFormat"]
         if t in dict.keys(obj)
     ]:
         if "Offset" in tag:  # StripOffsets, TileOffsets or FreeOffsets
-            raster_offsets = (raster_offset,)
+            raster_offsets = [raster_offset]
             tagname = tag.replace("Offsets", "ByteCounts")
             bytecounts = obj[tagname]
-            if isinstance(bytecounts, tuple):
-                for bytecount in obj[tagname]:
-                    raster_offsets += (raster_offsets[-1] + bytecount, )
-            obj[tag] = raster_offsets
+            if isinstance(bytecounts, (tuple, array.array)):
+                for bytecount in bytecounts[:-1]:
+                    raster_offsets.append(raster_offsets[-1] + bytecount)
+                raster_size = raster_offsets[-1] + bytecounts[-1] - \
+                    raster_offset
+            else:
+                raster_size = bytecounts
+            # keep large offset lists array-backed as read
+            obj[tag] = array.array(
+                ARRAY_TYPES[16 if bigtiff else 4], raster_offsets
+            ) if isinstance(bytecounts, array.array) else tuple(raster_offsets)
         else:  # JPEGInterchangeFormat
             obj[tag] = raster_offset
+    if hasattr(obj, "jpegIF"):
+        raster_size = len(obj.jpegIF)
+    if inline:
+        position += raster_size
+    next_ifd_offset = position if last else position + position % 2
+
+    def chunks():
+        yield _pack_IFD(
+            obj, offset, byteorder, bigtiff,
+            ifd1_offset if isinstance(ifd1, ifd.Ifd) else
+            0 if last else next_ifd_offset
+        )
+        written = offset + _sizeof(obj, bigtiff)
+        for sub, sub_offset in sub_ifds:
+            yield b"\x00" * (sub_offset - written)
+            packed = _pack_IFD(sub, sub_offset, byteorder, bigtiff)
+            written = sub_offset + len(packed)
+            yield packed
+        if isinstance(ifd1, ifd.Ifd):
+            yield b"\x00" * (ifd1_offset - written)
+            for chunk in ifd1_chunks:
+                yield chunk
+        if inline:
+            for data in _iter_data(obj):
+                yield data
+        yield b"\x00" * (next_ifd_offset - position)
+
+    return next_ifd_offset, chunks()
+
+
+def _iter_data(obj):
+    # raster data, chunk by chunk from source file if not loaded
+    if hasattr(obj, "jpegIF"):
+        yield getattr(obj, "jpegIF")
+    else:
+        raster = obj._raster_layout()[0]
+        if raster is not None:
+            for index, offset, data in obj._iter_raster(raster):
+                yield data
 
-    # recompute all modified tags
-    ifds = obj.pack(byteorder)
-    if isinstance(ifd1, ifd.Ifd):
-        ifds.update(ifd1=ifd1.pack(byteorder)["root"])
-    # adjust raser offset with diff between first computation and second one
-    raster_offset += len(ifds["root"]["data"]) - len(ifd_values)
 
-    # write IFDs
-    for key in [
-        k for k in ["root", "exfT", "gpsT", "itrT"]
-        if k in ifds
-    ]:
-        packed = ifds[key]
-        # go to according [SUB]IFD offset and determine associated data offset
-        if key == "root":
-            fileobj.seek(offset)
-            data_offset = ifd_offset_values
-        else:
-            sub_ifd_offset = obj[
-                "Exif IFD" if key == "exfT" else
-                "GPS IFD" if key == "gpsT" else
-                "Interoperability IFD"
-            ]
-            fileobj.seek(sub_ifd_offset)
-            data_offset = \
-                sub_ifd_offset + packed["size"]
-
-        tags = packed["tags"]
-        # write number of entries
-        pack(byteorder+"H", fileobj, (len(tags),))
-        # write all ifd entries and data
-        for entry, data, is_offset in tags:
-            fileobj.write(entry)
-            if not is_offset:
-                fileobj.write(data)
-            else:
-                # put offset and shift it by len(data) for next offset value
-                pack(byteorder+"L", fileobj, (data_offset, ))
-                data_offset += len(data)
-
-        if key == "root":
-            next_ifd_offset = fileobj.tell()
-        pack(byteorder+"L", fileobj, (0, ))
-        fileobj.write(packed["data"])
-
-    # write IFD1 (this should only be used with Jpeg exif thumbnail)
-    if "ifd1" in ifds:
-        ifd1_offset = fileobj.tell()
-        fileobj.seek(next_ifd_offset)
-        pack(byteorder+"L", fileobj, (ifd1_offset, ))
-        _write_IFD(ifd1, fileobj, ifd1_offset, byteorder="<", ifd1=None)
-
-    # write raster data
-    if obj.raster_loaded:
-        fileobj.seek(raster_offset)
-        if hasattr(obj, "jpegIF"):
-            fileobj.write(getattr(obj, "jpegIF"))
-        else:
-            for data in reduce(
-                tuple.__add__, [
-                    getattr(obj, name, tuple())
-                    for name in ["stripes", "tiles", "free"]
-                ]
-            ):
-                fileobj.write(data)
+def _sizeof_data(obj):
+    # size of data yielded by _iter_data
+    if hasattr(obj, "jpegIF"):
+        return len(obj.jpegIF)
+    return sum(obj._raster_layout()[-1])
 
+
+def _plan_cog(ifds, offset, byteorder="<", bigtiff=False):
+    """
+    Compute cloud optimized layout of IFD written from `offset`: all IFD
+    with their values first, then raster data from the last IFD (smallest
+    overview) to the first one (full resolution).
+
+    Returns:
+        iterator over data chunks to write
+    """
+    # sizing pass: IFD ends are known whatever the raster offsets are
+    position, ends = offset, []
+    for i in ifds:
+        position, chunks = _plan_IFD(
+            i, position, byteorder, None, bigtiff, i is ifds[-1], 0
+        )
+        ends.append(position)
+    position += position % 2
+    raster_offsets = {}
+    for i in reversed(ifds):
+        raster_offsets[id(i)] = position
+        position += _sizeof_data(i)
+    # packing pass with final raster offsets
+    position, plans = offset, []
+    for i in ifds:
+        position, chunks = _plan_IFD(
+            i, position, byteorder, None, bigtiff, i is ifds[-1],
+            raster_offsets[id(i)]
+        )
+        plans.append(chunks)
+
+    def chunks():
+        for plan in plans:
+            for chunk in plan:
+                yield chunk
+        yield b"\x00" * (ends[-1] % 2)
+        for i in reversed(ifds):
+            for data in _iter_data(i):
+                yield data
+
+    return chunks()
+
+
+def _ghost_area():
+    # GDAL structural metadata telling readers IFD are before tile data
+    content = (
+        "LAYOUT=IFDS_BEFORE_DATA\n"
+        "BLOCK_ORDER=ROW_MAJOR\n"
+        "KNOWN_INCOMPATIBLE_EDITION=NO\n"
+    )
+    # keep first IFD on a word boundary
+    content += " " * ((len(content) + 1) % 2)
+    return (
+        "GDAL_STRUCTURAL_METADATA_SIZE=%06d bytes\n" % len(content) +
+        content
+    ).encode("ascii")
+
+
+def _write_IFD(
+    obj, fileobj, offset, byteorder="<", ifd1=None, bigtiff=False, last=True
+):
+    "Write IFD in file object and return next ifd offset."
+    next_ifd_offset, chunks = _plan_IFD(
+        obj, offset, byteorder, ifd1, bigtiff, last
+    )
+    for chunk in chunks:
+        fileobj.write(chunk)
     return next_ifd_offset
 
 
+def _append(fileobj, data):
+    "Write data at the end of file object, on a word boundary."
+    fileobj.seek(0, 2)
+    if fileobj.tell() % 2:
+        fileobj.write(b"\x00")
+    offset = fileobj.tell()
+    fileobj.write(data)
+    return offset
+
+
+def _update_entry(tag, fileobj, byteorder="<", bigtiff=False, entry=None):
+    "Write tag value in file object if needed and return packed IFD entry."
+    _ofs = IFD_FORMATS[bigtiff][-1]
+    info, data, is_offset = tag.pack(byteorder, bigtiff)
+    if not is_offset:
+        return info + data
+    # reuse source value location if it is large enough
+    if entry is not None:
+        size = _value_struct(byteorder, entry[1], entry[2]).size
+        if len(entry[-1]) < size and len(data) <= size:
+            value_offset, = _compiled(byteorder + _ofs).unpack(entry[-1])
+            fileobj.seek(value_offset)
+            if fileobj.read(len(data)) != data:
+                fileobj.seek(value_offset)
+                fileobj.write(data)
+            return info + _compiled(byteorder + _ofs).pack(value_offset)
+    return info + _compiled(byteorder + _ofs).pack(_append(fileobj, data))
+
+
+def _update_table(obj, fileobj, byteorder="<", bigtiff=False, next_ifd=0):
+    "Patch or append IFD entry table in file object and return its offset."
+    _cnt, _entry, _ofs = IFD_FORMATS[bigtiff]
+    entry_struct = _entry_struct(byteorder, bigtiff)
+    offset, entries = getattr(obj, "_table", (None, []))
+    source = dict((entry[0], entry) for entry in entries)
+    # tags not read yet (lazy mode) and tags unknown by Tyf are unchanged
+    current = dict(
+        (entry[0], entry_struct.pack(*entry)) for entry in entries
+        if tags.lookup(entry[0])[0] is False
+    )
+    for entry in getattr(obj, "_index", {}).values():
+        current[entry[0]] = entry_struct.pack(*entry)
+    for tag in dict.values(obj):
+        # 64-bit types are not allowed in classic TIFF
+        if not bigtiff and tag.type in [16, 17, 18]:
+            tag.type = 9 if tag.type == 17 else 4
+        current[tag.tag] = _update_entry(
+            tag, fileobj, byteorder, bigtiff, source.get(tag.tag)
+        )
+
+    # same entries: overwrite the modified ones and next IFD offset
+    if offset is not None and sorted(current) == sorted(source):
+        start = offset + _compiled("=" + _cnt).size
+        for i, entry in enumerate(entries):
+            if current[entry[0]] != entry_struct.pack(*entry):
+                fileobj.seek(start + i * entry_struct.size)
+                fileobj.write(current[entry[0]])
+        fileobj.seek(start + len(entries) * entry_struct.size)
+        fileobj.write(_compiled(byteorder + _ofs).pack(next_ifd))
+        numbers = [entry[0] for entry in entries]
+    # else write a new table over the source one if it fits or at the end
+    # of file
+    else:
+        numbers = sorted(current)
+        table = \
+            _compiled(byteorder + _cnt).pack(len(numbers)) + \
+            b"".join(current[n] for n in numbers) + \
+            _compiled(byteorder + _ofs).pack(next_ifd)
+        if offset is not None and len(numbers) <= len(entries):
+            fileobj.seek(offset)
+            fileobj.write(table)
+        else:
+            offset = _append(fileobj, table)
+    obj._table = (offset, [entry_struct.unpack(current[n]) for n in numbers])
+    return offset
+
+
+def _update_IFD(obj, fileobj, byteorder="<", bigtiff=False, next_ifd=0):
+    "Patch IFD and sub IFD in file object and return IFD offset."
+    _write_gkd(obj)
+    # raster is not moved: restore its source offsets if saving changed them
+    name, offsets, bytecounts = getattr(obj, "_layout", (None, (), ()))
+    for raster, key, length in ifd._RASTERS:
+        if raster == name:
+            obj[key] = offsets
+    for name, key in [
+        ("exfT", "Exif IFD"), ("gpsT", "GPS IFD"),
+        ("itrT", "Interoperability IFD")
+    ]:
+        if hasattr(obj, name):
+            obj.set(
+                key, 18 if bigtiff else 4,
+                _update_table(getattr(obj, name), fileobj, byteorder, bigtiff)
+            )
+    return _update_table(obj, fileobj, byteorder, bigtiff, next_ifd)
+
+
 def _fileobj(f, mode):
-    if hasattr(f, "close"):
+    # any object with a `write` method can be used as output
+    if hasattr(f, "close") or hasattr(f, "write"):
         fileobj = f
         _close = False
     else:
@@ -253,23 +598,176 @@ def _fileobj(f, mode):
     return fileobj, _close
 
 
-def open(f):
+def _mapfile(fileobj):
+    "Return a read-only memory map of file object if possible."
+    try:
+        return mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, io.UnsupportedOperation, ValueError):
+        return fileobj
+
+
+def _copy_range(src, dst, offset, size):
+    "Copy `size` bytes of `src` from `offset` at current `dst` position."
+    # let the kernel copy the bytes if possible (unbuffered file objects
+    # share their position with file descriptor)
+    for name in ["copy_file_range", "sendfile"]:
+        copy = getattr(os, name, None)
+        if copy is None:
+            continue
+        try:
+            while size > 0:
+                if name == "sendfile":
+                    sent = copy(dst.fileno(), src.fileno(), offset, size)
+                else:
+                    sent = copy(src.fileno(), dst.fileno(), size, offset)
+                if sent == 0:
+                    break
+                offset += sent
+                size -= sent
+            return
+        except OSError:
+            continue
+    src.seek(offset)
+    while size > 0:
+        data = src.read(min(size, 2**20))
+        if not data:
+            break
+        dst.write(data)
+        size -= len(data)
+
+
+def _same_file(f, path):
+    "Return `True` if output `f` is the source file `path`."
+    text = (str, bytes, type(u""))
+    if not isinstance(f, text) or not isinstance(path, text) or \
+       not os.path.exists(f):
+        return False
+    try:
+        return os.path.samefile(f, path)
+    except (AttributeError, OSError, TypeError):  # python 2.x on windows
+        return os.path.abspath(f) == os.path.abspath(path)
+
+
+def _replace_file(path, chunks):
+    "Write chunks into a temporary file and replace `path` with it."
+    import shutil
+    import tempfile
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    dst = io.open(fd, "wb")
+    try:
+        for chunk in chunks:
+            dst.write(chunk)
+    except Exception:
+        dst.close()
+        os.remove(tmp)
+        raise
+    dst.close()
+    shutil.copymode(path, tmp)
+    getattr(os, "replace", os.rename)(tmp, path)
+
+
+def _release(source):
+    # close memory map once nothing is read from it, views still exported
+    # keep it alive
+    if isinstance(source, mmap.mmap):
+        try:
+            source.close()
+        except BufferError:
+            pass
+
+
+class _Segment(object):
+    "JPEG segment data left in source file until needed."
+    __slots__ = ("source", "offset", "size", "kind")
+
+    def __init__(self, source, offset, size, kind=None):
+        self.source = source
+        self.offset = offset
+        self.size = size
+        #: `"exif"` or `"xmp"` for APP1 segments
+        self.kind = kind
+
+    def __len__(self):
+        return self.size
+
+    def chunks(self):
+        "Return iterator over segment data read from source file."
+        source = self.source
+        fileobj = source if hasattr(source, "read") else io.open(source, "rb")
+        try:
+            offset, end = self.offset, self.offset + self.size
+            while offset < end:
+                data = ifd._read_at(
+                    fileobj, offset, min(ifd.READ_SIZE, end - offset)
+                )
+                if not len(data):
+                    break
+                offset += len(data)
+                yield data
+        finally:
+            if fileobj is not source:
+                fileobj.close()
+
+    def read(self):
+        "Return segment data read from source file."
+        return b"".join(self.chunks())
+
+
+def _segment_data(marker, value):
+    "Return JPEG segment data, APP1 ones being recomputed."
+    if marker != 0xffe1:
+        return value
+    elif isinstance(value, TiffFile):
+        return b"Exif\x00\x00" + b"".join(
+            value.iter_chunks(idx=0, ifd1=value[-1])
+            if len(value) == 2 else value.iter_chunks()
+        )
+    elif isinstance(value, xmp.Element):
+        data = xmp.tostring(value)
+        return b"http://ns.adobe.com/xap/1.0/\x00" + (
+            data if isinstance(data, bytes) else data.encode("utf-8")
+        )
+    else:
+        return b""
+
+
+def open(f, lazy=False, mapped=False):
     """
     Return JpegFile or TiffFile according to `f`. If it is a file object,
     it is not closed.
 
     Arguments:
-        f (buffer or string): a valid file path or a python file object
+        f (buffer or string): a valid file path or url, a python file object
+                              or a `Tyf.source.ByteSource`
+        lazy (bool): if `True`, TIFF tag values are read only when accessed
+                     (see `Tyf.TiffFile`), JPEG APP1 segments are parsed
+                     only when accessed and scan data is not read (see
+                     `Tyf.JpegFile`)
+        mapped (bool): if `True`, file is memory mapped and raster or scan
+                       data are exposed as `memoryview` slices of the map
     """
+    # remote file is read with range requests (see `Tyf.source`)
+    if isinstance(f, (str, type(u""))) and \
+       f.startswith(("http://", "https://")):
+        from Tyf.source import HTTPSource
+        f = HTTPSource(f)
     fileobj, _close = _fileobj(f, "rb")
+    if mapped:
+        mapping = _mapfile(fileobj)
+        if mapping is not fileobj:
+            # memory map stays valid once file is closed and is released
+            # with the objects using it
+            if _close:
+                fileobj.close()
+            fileobj, _close = mapping, False
 
     first, = unpack(">H", fileobj)
     fileobj.seek(0)
 
     if first == 0xffd8:
-        obj = JpegFile(fileobj)
+        obj = JpegFile(fileobj, lazy=lazy)
     elif first in [0x4d4d, 0x4949]:
-        obj = TiffFile(fileobj)
+        obj = TiffFile(fileobj, lazy=lazy)
     else:
         obj = None
 
@@ -279,15 +777,16 @@ def open(f):
     if obj is None:
         raise InvalidFileError("file is not a valid JPEG nor TIFF image")
     else:
+        # memory map has no name, keep source path for saving over it or
+        # in place update
+        if mapped and not hasattr(f, "close"):
+            obj._filename = f
         return obj
 
 
 def getGeokeyDirectories(cls):
-    if not hasattr(cls, "_geokey_directories"):
-        setattr(cls, "_geokey_directories", [
-            gkd.Gkd.from_ifd(ifd) for ifd in cls
-        ])
-    return getattr(cls, "_geokey_directories")
+    # GeoKey directories are cached by their IFD
+    return [ifd.gkd for ifd in cls]
 
 
 class TiffFile(list):
@@ -322,29 +821,46 @@ class TiffFile(list):
         None, None, "True if all raster data loaded"
     )
 
-    def __init__(self, fileobj):
+    def __init__(self, fileobj, lazy=False):
+        """
+        Arguments:
+            fileobj: a python file object
+            lazy (bool): if `True`, only IFD entries are read and tag values
+                         are fetched and decoded on first access. Given file
+                         object has to stay open if it has no `name`
+                         attribute, else tags are read from file path.
+        """
         # determine byteorder
         first, = unpack(">H", fileobj)
         byteorder = "<" if first == 0x4949 else ">"
         # manage according to magic number found
         magic_number, = unpack(byteorder+"H", fileobj)
-        if magic_number not in [0x732E, 0x2A]:  # 29486, 42
+        if magic_number not in [0x732E, 0x2A, 0x2B]:  # 29486, 42, 43
             fileobj.close()
-            if magic_number == 0x2B:  # 43
-                raise InvalidFileError("BigTIFF file not supported")
-            else:
-                raise InvalidFileError("Bad magic number. Not a valid TIFF file")
+            raise InvalidFileError("Bad magic number. Not a valid TIFF file")
+        #: `True` if file is a BigTIFF one
+        self.bigtiff = magic_number == 0x2B
+        #: `">"` if file is big-endian else `"<"`
+        self.byteorder = byteorder
+        # BigTIFF header continues with offset bytesize and a constant
+        if self.bigtiff and unpack(byteorder+"HH", fileobj) != (8, 0):
+            fileobj.close()
+            raise InvalidFileError("Bad BigTIFF header")
 
         ifds = []
-        next_ifd, = unpack(byteorder+"L", fileobj)
+        next_ifd, = unpack(byteorder+IFD_FORMATS[self.bigtiff][-1], fileobj)
         while next_ifd != 0:
             i = ifd.Ifd(tag_family=[tags.bTT, tags.pTT, tags.xTT])
-            next_ifd = _from_buffer(i, fileobj, next_ifd, byteorder)
+            next_ifd = _from_buffer(
+                i, fileobj, next_ifd, byteorder, lazy, self.bigtiff
+            )
             ifds.append(i)
 
-        # keep filename source to load raster when needed
+        # keep filename source to load or stream raster when needed
         if hasattr(fileobj, "name"):
             self._filename = fileobj.name
+            for i in ifds:
+                i._source = (fileobj.name, byteorder)
         # load raster if initializing from fileobj
         else:
             for i in ifds:
@@ -352,18 +868,106 @@ class TiffFile(list):
 
         list.__init__(self, ifds)
 
-    def load_raster(self, idx=None):
+    def load_raster(self, idx=None, gap=None):
+        """
+        Load raster data from source file. Strips or tiles are read in file
+        order, near ones being read at once.
+
+        Arguments:
+            idx (int): IFD index to load, all IFD are loaded if `None`
+            gap (int): maximum byte gap between strips or tiles read at once,
+                       default to `Tyf.ifd.READ_GAP`
+        """
         if hasattr(self, "_filename"):
             in_, c_ = _fileobj(self._filename, "rb")
             for item in iter(self) if idx is None else [self[idx]]:
                 if not item.raster_loaded:
-                    ifd._load_raster(item, in_)
-            in_.close()
+                    ifd._load_raster(item, in_, gap)
+            # caller file object or byte source is still used by lazy tags
+            if c_:
+                in_.close()
+
+    def iter_chunks(
+        self, byteorder="<", idx=None, ifd1=None, bigtiff=None, layout=None,
+        ghost=False
+    ):
+        """
+        Return iterator over the bytes of the TIFF file, in order. Nothing is
+        seeked back so chunks can be streamed to any output (pipe, socket,
+        HTTP response...).
+
+        ```python
+        >>> with open("output.tif", "wb") as out:
+        ...     for chunk in tif.iter_chunks():
+        ...         out.write(chunk)
+        ```
 
-    def save(self, f, byteorder="<", idx=None, ifd1=None):
+        Arguments:
+            byteorder (string): `">"` if big-endian used else `"<"`
+            idx (int): IFD index to save
+            ifd1 (Tyf.ifd.Ifd): IFD to be used as thumbnail (only needed with
+                                JPEG saving)
+            bigtiff (bool): `True` to save as BigTIFF file, if `None` given
+                            source file format is used
+            layout (string): `"cog"` to write cloud optimized GeoTIFF
+                             layout, see `Tyf.TiffFile.save`
+            ghost (bool): `True` to write GDAL ghost area with `"cog"`
+                          layout
+        Returns:
+            iterator over `bytes` (or `memoryview` for raster data) chunks
+        """
+        if layout not in [None, "cog"]:
+            raise ValueError("unknown layout %r" % (layout, ))
+        if bigtiff is None:
+            bigtiff = getattr(self, "bigtiff", False)
+
+        if bigtiff:
+            yield _compiled(byteorder+"HHHH").pack(
+                0x4949 if byteorder == "<" else 0x4d4d, 0x2B, 8, 0
+            )
+            next_ifd = 16
+        else:
+            yield _compiled(byteorder+"HH").pack(
+                0x4949 if byteorder == "<" else 0x4d4d, 0x2A
+            )
+            next_ifd = 8
+
+        ghost = _ghost_area() if layout == "cog" and ghost else b""
+        next_ifd += len(ghost)
+        yield _compiled(byteorder+IFD_FORMATS[bigtiff][-1]).pack(next_ifd)
+        yield ghost
+        ifds = list(iter(self) if idx is None else [self[idx]])
+        if layout == "cog":
+            for chunk in _plan_cog(ifds, next_ifd, byteorder, bigtiff):
+                yield chunk
+            return
+        for i in ifds:
+            next_ifd, chunks = _plan_IFD(
+                i, next_ifd, byteorder, ifd1=ifd1, bigtiff=bigtiff,
+                last=i is ifds[-1]
+            )
+            for chunk in chunks:
+                yield chunk
+
+    def save(
+        self, f, byteorder="<", idx=None, ifd1=None, bigtiff=None,
+        layout=None, ghost=False
+    ):
         """
         Save object as a TIFF file. If `f` is a file object, it is not
-        closed.
+        closed. Output is written sequentially so `f` may be any object with
+        a `write` method.
+
+        With `"cog"` layout, all IFD and their values (GeoKey directories
+        included) are written first, then raster data from the last IFD to
+        the first one. IFD have to be given full resolution first, then
+        overviews by decreasing size, so smallest overview data lies just
+        after the IFD. Tiled rasters can then be partially read from the
+        first bytes of the file.
+
+        ```python
+        >>> cog.save("output.tif", layout="cog", ghost=True)
+        ```
 
         Arguments:
             f (buffer or string): a valid file path or a python file object
@@ -371,24 +975,90 @@ class TiffFile(list):
             idx (int): IFD index to save
             ifd1 (Tyf.ifd.Ifd): IFD to be used as thumbnail (only needed with
                                 JPEG saving)
+            bigtiff (bool): `True` to save as BigTIFF file, if `None` given
+                            source file format is used
+            layout (string): `"cog"` to write cloud optimized layout, else
+                             each IFD is followed by its raster data
+            ghost (bool): `True` to write GDAL ghost area (structural
+                          metadata) before IFD with `"cog"` layout
         """
-        self.load_raster()
-        fileobj, _close = _fileobj(f, "wb")
+        chunks = self.iter_chunks(byteorder, idx, ifd1, bigtiff, layout, ghost)
+        # raster and lazy values are read from source file while writing
+        if _same_file(f, getattr(self, "_filename", None)):
+            self._detach()
+            _replace_file(f, chunks)
+            return
 
-        pack(
-            byteorder+"HH", fileobj,
-            (0x4949 if byteorder == "<" else 0x4d4d, 0x2A, )
-        )
-        next_ifd = 8
+        fileobj, _close = _fileobj(f, "wb")
 
-        for i in iter(self) if idx is None else [self[idx]]:
-            pack(byteorder+"L", fileobj, (next_ifd,))
-            next_ifd = _write_IFD(i, fileobj, next_ifd, byteorder, ifd1=ifd1)
+        for chunk in chunks:
+            fileobj.write(chunk)
 
         if _close:
             fileobj.close()
             del fileobj
 
+    def _detach(self):
+        # read into memory all data left in source file before it is
+        # replaced, in place update is not possible anymore
+        self.load_raster()
+        for i in self:
+            list(i.tags())
+            for name in ["stripes", "tiles", "free", "jpegIF"]:
+                value = getattr(i, name, None)
+                if isinstance(value, memoryview):
+                    setattr(i, name, value.tobytes())
+                elif isinstance(value, tuple):
+                    setattr(i, name, tuple(
+                        v.tobytes() if isinstance(v, memoryview) else v
+                        for v in value
+                    ))
+            for sub in [i] + [
+                getattr(i, name) for name in ["exfT", "gpsT", "itrT"]
+                if hasattr(i, name)
+            ]:
+                sub.__dict__.pop("_table", None)
+                _release(getattr(sub, "_source", (None, ))[0])
+
+    def update(self, f=None):
+        """
+        Update TIFF file in place without touching raster data. Modified
+        values are written over source ones if they fit, else at the end of
+        file. IFD with added or removed tags are written at the end of file
+        and the offsets pointing to them are updated.
+
+        ```python
+        >>> tif = Tyf.open("test/CEA.tif")
+        >>> tif[0]["ImageDescription"] = "Cylindrical Equal Area"
+        >>> tif.update()
+        ```
+
+        Arguments:
+            f (string): path of file to update, default to source file. It
+                        has to share source file layout.
+        """
+        path = getattr(self, "_filename", None) if f is None else f
+        if path is None:
+            raise ValueError("TIFF file has no source file path to update")
+        if not all(hasattr(i, "_table") for i in self):
+            raise ValueError("new IFD can not be updated in place, use save")
+        fileobj = io.open(path, "r+b")
+        try:
+            # IFD are patched from the last one to know next IFD offsets
+            next_ifd = 0
+            for i in reversed(self):
+                next_ifd = _update_IFD(
+                    i, fileobj, self.byteorder, self.bigtiff, next_ifd
+                )
+            fileobj.seek(8 if self.bigtiff else 4)
+            pack(
+                self.byteorder + IFD_FORMATS[self.bigtiff][-1], fileobj,
+                (next_ifd, )
+            )
+        finally:
+            fileobj.close()
+        self._filename = path
+
 
 class JpegFile(list):
     """
@@ -420,12 +1090,19 @@ class JpegFile(list):
         None, None, "readonly thumbnail IFD attribute"
     )
 
-    def __init__(self, fileobj):
+    def __init__(self, fileobj, lazy=False):
         """
         Arguments:
             fileobj: a python file object
+            lazy (bool): if `True`, segments are scanned up to scan data
+                         which is not read. Exif and XMP segments are parsed
+                         on first `ifd` or `xmp` access and unparsed ones are
+                         copied as is on save. Given file object has to stay
+                         open if it has no `name` attribute, else data are
+                         read from file path.
         """
         sgmt = []
+        source = getattr(fileobj, "name", fileobj)
 
         fileobj.seek(0)
         marker, = unpack(">H", fileobj)
@@ -436,14 +1113,43 @@ class JpegFile(list):
         # out and the other is empty. We use this to track the size of the last app1 segment
         # and only update self.ifd if it is a larger segment than previously encountered
         largest_app1_segment_size = -1
+        # segment locations in source file, used by in place update
+        spans = []
 
         while marker != 0xffd9:  # EOI (End Of Image) Marker
+            position = fileobj.tell()
             marker, count = unpack(">HH", fileobj)
             # if JPEG raw data
             if marker == 0xffda:
                 fileobj.seek(-2, 1)
-                sgmt.append((0xffda, fileobj.read()[:-2]))
+                if lazy:
+                    start = fileobj.tell()
+                    fileobj.seek(0, 2)
+                    sgmt.append((0xffda, _Segment(
+                        source, start, fileobj.tell() - 2 - start
+                    )))
+                elif isinstance(fileobj, mmap.mmap):
+                    start = fileobj.tell()
+                    sgmt.append(
+                        (0xffda, memoryview(fileobj)[start:len(fileobj)-2])
+                    )
+                else:
+                    sgmt.append((0xffda, fileobj.read()[:-2]))
                 marker = 0xffd9
+            elif marker == 0xffe1 and lazy:
+                # only look at segment header, data is read when needed
+                data = fileobj.read(min(count-2, 30))
+                fileobj.seek(position + 2 + count)
+                if data[:6] == b"Exif\x00\x00":
+                    if count > largest_app1_segment_size:
+                        largest_app1_segment_size = count
+                        sgmt.append((0xffe1, _Segment(
+                            source, position + 4, count - 2, "exif"
+                        )))
+                elif b"ns.adobe.com" in data[:30]:
+                    sgmt.append((0xffe1, _Segment(
+                        source, position + 4, count - 2, "xmp"
+                    )))
             elif marker == 0xffe1:
                 data = fileobj.read(count-2)
                 if data[:6] == b"Exif\x00\x00":
@@ -460,8 +1166,49 @@ class JpegFile(list):
             else:
                 sgmt.append((marker, fileobj.read(count-2)))
 
+            if len(sgmt) > len(spans):
+                spans.append((
+                    sgmt[-1], position,
+                    position + 2 + len(sgmt[-1][-1]) if marker == 0xffd9 else
+                    fileobj.tell()
+                ))
+
+        self._segments = spans
+        if hasattr(fileobj, "name"):
+            self._filename = fileobj.name
         list.__init__(self, sgmt)
 
+    def __getattr__(self, attr):
+        # parse lazy Exif or XMP segment on first access
+        kind = {"ifd": "exif", "xmp": "xmp"}.get(attr, None)
+        if kind is not None and self._parse(kind):
+            return getattr(self, attr)
+        raise AttributeError(
+            "%r object has no attribute %r" % (self.__class__.__name__, attr)
+        )
+
+    def _parse(self, kind):
+        # parse the last lazy APP1 segment of given kind and return True
+        for i in range(len(self) - 1, -1, -1):
+            marker, value = segment = list.__getitem__(self, i)
+            if isinstance(value, _Segment) and value.kind == kind:
+                data = value.read()
+                if kind == "exif":
+                    string = StringIO(data[6:])
+                    self.ifd = value = TiffFile(string)
+                    string.close()
+                else:
+                    self.xmp = value = \
+                        xmp.fromstring(data[data.find(b"\x00")+1:])
+                list.__setitem__(self, i, (marker, value))
+                # parsed segment keeps its source location
+                self._segments = [
+                    (list.__getitem__(self, i) if s is segment else s, a, b)
+                    for s, a, b in self._segments
+                ]
+                return True
+        return False
+
     def __getitem__(self, item):
         """
         Return item from `ifd0`.
@@ -493,46 +1240,157 @@ class JpegFile(list):
         Arguments:
             f (buffer or string): a valid file path or a python file object
         """
+        # lazy segments and scan data are read from source file while
+        # writing
+        if _same_file(f, getattr(self, "_filename", None)):
+            self._detach()
+            _replace_file(f, self.iter_chunks())
+            return
+
         fileobj, _close = _fileobj(f, "wb")
-        pack(">H", fileobj, (0xffd8,))
 
-        for marker, value in self:
-            if marker == 0xffda:
-                pack(">H", fileobj, (marker,))
+        for chunk in self.iter_chunks():
+            fileobj.write(chunk)
 
-            elif marker == 0xffe1:
-                if isinstance(value, TiffFile):
-                    string = StringIO()
-                    if len(value) == 2:
-                        value.save(string, idx=0, ifd1=value[-1])
-                    else:
-                        value.save(string)
-                    data = string.getvalue()
-                    value = b"Exif\x00\x00" + (
-                        data if isinstance(data, bytes)
-                        else data.encode("utf-8")
-                    )
-                    string.close()
-                elif isinstance(value, xmp.Element):
-                    data = xmp.tostring(self.xmp)
-                    value = b"http://ns.adobe.com/xap/1.0/\x00" + (
-                        data if isinstance(data, bytes)
-                        else data.encode("utf-8")
-                    )
-                else:
-                    value = b""
-                pack(">HH", fileobj, (marker, len(value) + 2))
+        if _close:
+            fileobj.close()
+            del fileobj
 
+    def _detach(self):
+        # read into memory all data left in source file before it is
+        # replaced, in place update is not possible anymore
+        while self._parse("exif") or self._parse("xmp"):
+            pass
+        sources = set()
+        for i, (marker, value) in enumerate(self):
+            if isinstance(value, _Segment):
+                sources.add(value.source)
+                list.__setitem__(self, i, (marker, value.read()))
+            elif isinstance(value, memoryview):
+                sources.add(getattr(value, "obj", None))
+                list.__setitem__(self, i, (marker, value.tobytes()))
+        self._segments = []
+        for source in sources:
+            _release(source)
+
+    def iter_chunks(self):
+        """
+        Return iterator over the bytes of the JPEG file, in order, so it can
+        be streamed to any output (see `Tyf.TiffFile.iter_chunks`).
+
+        Returns:
+            iterator over `bytes` (or `memoryview` for scan data) chunks
+        """
+        yield b"\xff\xd8"
+        for marker, value in self:
+            if marker == 0xffda:
+                yield _compiled(">H").pack(marker)
+            elif isinstance(value, _Segment):
+                yield _compiled(">HH").pack(marker, len(value) + 2)
+            else:
+                value = _segment_data(marker, value)
+                yield _compiled(">HH").pack(marker, len(value) + 2)
+            # lazy segment is copied from source file
+            if isinstance(value, _Segment):
+                for chunk in value.chunks():
+                    yield chunk
             else:
-                pack(">HH", fileobj, (marker, len(value) + 2))
+                yield value
+        yield b"\xff\xd9"
 
-            fileobj.write(value)
+    def update(self, f=None):
+        """
+        Update JPEG file in place, only APP1 segments (`ifd0`, `ifd1` and
+        `xmp`) are recomputed. If they fit in their source segments, they
+        are padded and written over them. Else, a new file is assembled,
+        copying untouched segments from source file without loading them,
+        and replaces the updated one.
 
-        pack(">H", fileobj, (0xffd9,))
+        ```python
+        >>> jpg = Tyf.open("test/IMG_20150730_210115.jpg")
+        >>> jpg.ifd0["ImageDescription"] = "Tyf rocks"
+        >>> jpg.update()
+        ```
 
-        if _close:
-            fileobj.close()
-            del fileobj
+        Arguments:
+            f (string): path of file to update, default to source file. It
+                        has to share source file segment layout.
+        """
+        path = getattr(self, "_filename", None) if f is None else f
+        if path is None:
+            raise ValueError("JPEG file has no source file path to update")
+        spans = dict(
+            (id(segment), (start, end))
+            for segment, start, end in self._segments
+        )
+        # segments from source in the same order: try to patch APP1 in place
+        if len(self) == len(self._segments) and all(
+            segment is source[0]
+            for segment, source in zip(self, self._segments)
+        ):
+            patches = []
+            for segment in self:
+                marker, value = segment
+                if marker == 0xffe1 and not isinstance(value, _Segment):
+                    start, end = spans[id(segment)]
+                    data = _segment_data(marker, value)
+                    if len(data) > end - start - 4:
+                        break
+                    patches.append((start + 4, data.ljust(
+                        end - start - 4,
+                        b"\x00" if isinstance(value, TiffFile) else b" "
+                    )))
+            else:
+                fileobj = io.open(path, "r+b")
+                for offset, data in patches:
+                    fileobj.seek(offset)
+                    fileobj.write(data)
+                fileobj.close()
+                return
+
+        # else copy source into a temporary file and replace it
+        import shutil
+        import tempfile
+        src = io.open(path, "rb", buffering=0)
+        fd, tmp = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path))
+        )
+        dst = io.open(fd, "wb", buffering=0)
+        try:
+            segments = []
+            pack(">H", dst, (0xffd8,))
+            for segment in self:
+                marker, value = segment
+                start = dst.tell()
+                if id(segment) in spans and (
+                    marker != 0xffe1 or isinstance(value, _Segment)
+                ):
+                    offset, end = spans[id(segment)]
+                    _copy_range(src, dst, offset, end - offset)
+                else:
+                    if marker == 0xffda:
+                        pack(">H", dst, (marker,))
+                    else:
+                        value = _segment_data(marker, value)
+                        pack(">HH", dst, (marker, len(value) + 2))
+                    dst.write(value)
+                segments.append((segment, start, dst.tell()))
+            pack(">H", dst, (0xffd9,))
+        except Exception:
+            dst.close()
+            os.remove(tmp)
+            raise
+        finally:
+            src.close()
+        dst.close()
+        shutil.copymode(path, tmp)
+        getattr(os, "replace", os.rename)(tmp, path)
+        self._filename, self._segments = path, segments
+        # lazy segment data now lives in the updated file
+        for (marker, value), start, end in segments:
+            if isinstance(value, _Segment):
+                value.source = path
+                value.offset = start + (2 if marker == 0xffda else 4)
 
     def save_thumbnail(self, f):
         """
@@ -594,12 +1452,44 @@ class JpegFile(list):
             ifd0.pop(key)
 
 
-# if PIL exists do some overridings
-try:
-    from PIL import Image as _Image
-except ImportError:
-    pass
-else:
+# asyncio API uses python 3.5+ syntax, it is imported with asyncio on first
+# call
+if sys.version_info >= (3, 5):
+    def aopen(source, size=None, raster=False):
+        """
+        Return a coroutine reading JpegFile or TiffFile from an asynchronous
+        source, see `Tyf.aio.aopen`.
+        """
+        from Tyf import aio
+        return aio.aopen(source, size, raster)
+
+
+def override_pil():
+    """
+    Override Pillow so EXIF data of JPEG images are read as `Tyf.TiffFile`
+    and kept when saving JPEG images (unless `strip_exif=True` is given to
+    `save`). Nothing is done on `Tyf` import. It has to be called before
+    any Pillow image plugin is imported.
+
+    ```python
+    >>> Tyf.override_pil()
+    True
+    >>> from PIL import Image
+    >>> Image.open("test/IMG_TEST_001.jpg")._getexif()
+    [{...}, {...}]
+    ```
+
+    Returns:
+        `True` if Pillow is installed and overridden else `False`
+    """
+    global Image
+    try:
+        from PIL import Image as _Image
+    except ImportError:
+        return False
+    if "Image" in globals():
+        return True
+
     def _getexif(im):
         try:
             data = im.info["exif"]
@@ -650,4 +1540,4 @@ else:
     from PIL import JpegImagePlugin
     JpegImagePlugin._getexif_ = JpegImagePlugin._getexif
     JpegImagePlugin._getexif = _getexif
-    del _getexif
+    return True
@@ -0,0 +1,224 @@
+# -*- encoding:utf-8 -*-
+"""
+Asynchronous metadata reading (python 3.5+ only).
+
+The source is any object with an `async read_at(offset, size)` method
+returning at most `size` bytes. Only the byte ranges needed by TIFF and JPEG
+parsers are read from source, independent ranges being read concurrently.
+
+```python
+>>> class Reader:
+...     def __init__(self, data):
+...         self.data = data
+...     async def read_at(self, offset, size):
+...         return self.data[offset:offset + size]
+>>> jpg = await Tyf.aopen(Reader(open("test/IMG_TEST_001.jpg", "rb").read()))
+>>> jpg.ifd0["Model"]
+'...'
+```
+"""
+
+import bisect
+import asyncio
+
+from Tyf import IFD_FORMATS, InvalidFileError
+from Tyf import TiffFile, JpegFile, _compiled, _value_struct, _entry_struct
+from Tyf import _iter_unpack
+from Tyf import ifd
+
+#: read ahead size used to scan JPEG segments, a JPEG segment is not bigger
+#: than 64 KiB
+READ_AHEAD = 2**16
+
+# sub IFD pointer tags read with their parent IFD
+_SUB_IFDS = (34665, 34853, 40965)
+
+
+class _Ranges(object):
+    """
+    Read only file object over byte ranges fetched from an async source.
+    Reading a range not fetched raises `IOError`.
+    """
+
+    def __init__(self, source, size=None):
+        self.source = source
+        self.size = size
+        self.position = 0
+        self.starts = []
+        self.datas = []
+        # used by TiffFile and JpegFile as source of lazy tag values and
+        # raster chunks instead of a file path
+        self.name = self
+
+    def _find(self, offset, size):
+        # return data and its start offset covering the given range
+        i = bisect.bisect_right(self.starts, offset)
+        while i > 0:
+            i -= 1
+            start, data = self.starts[i], self.datas[i]
+            if offset + size <= start + len(data):
+                return start, data
+        return None, None
+
+    async def fetch(self, offset, size):
+        "Read range from source if not already fetched."
+        if self._find(offset, size)[0] is None:
+            data = bytes(await self.source.read_at(offset, size))
+            i = bisect.bisect_right(self.starts, offset)
+            self.starts.insert(i, offset)
+            self.datas.insert(i, data)
+            return data
+        start, data = self._find(offset, size)
+        return data[offset - start:offset - start + size]
+
+    def seek(self, offset, whence=0):
+        if whence == 2:
+            if self.size is None:
+                raise IOError("source size is unknown")
+            offset += self.size
+        elif whence == 1:
+            offset += self.position
+        self.position = offset
+        return offset
+
+    def tell(self):
+        return self.position
+
+    def read(self, size=-1):
+        if size < 0:
+            if self.size is None:
+                raise IOError("source size is unknown")
+            size = self.size - self.position
+        offset = self.position
+        start, data = self._find(offset, size)
+        if start is None:
+            # allow short read at the end of source
+            start, data = self._find(offset, 0)
+            if start is None or start + len(data) != self.size:
+                raise IOError(
+                    "bytes %d-%d not read from source" % (
+                        offset, offset + size
+                    )
+                )
+        self.position = min(offset + size, start + len(data))
+        return data[offset - start:self.position - start]
+
+
+async def _fetch_IFD(ranges, offset, byteorder, bigtiff, sub_ifds=True):
+    # read IFD table, out-of-line values and sub IFD concurrently and
+    # return next IFD offset
+    _cnt, _entry, _ofs = IFD_FORMATS[bigtiff]
+    cnt_struct = _compiled(byteorder + _cnt)
+    nb_entry, = cnt_struct.unpack(await ranges.fetch(offset, cnt_struct.size))
+    entry_struct = _entry_struct(byteorder, bigtiff)
+    ofs_struct = _compiled(byteorder + _ofs)
+    start = offset + cnt_struct.size
+    table = await ranges.fetch(
+        start, nb_entry * entry_struct.size + ofs_struct.size
+    )
+    reads = []
+    for tag, typ, count, value_or_offset in _iter_unpack(
+        entry_struct, table[:nb_entry * entry_struct.size]
+    ):
+        fmt = _value_struct(byteorder, typ, count)
+        if fmt.size > len(value_or_offset):
+            reads.append(ranges.fetch(
+                ofs_struct.unpack(value_or_offset)[0], fmt.size
+            ))
+        elif sub_ifds and tag in _SUB_IFDS:
+            reads.append(_fetch_IFD(
+                ranges, fmt.unpack_from(value_or_offset)[0], byteorder,
+                bigtiff, False
+            ))
+    await asyncio.gather(*reads)
+    return ofs_struct.unpack(table[-ofs_struct.size:])[0]
+
+
+async def _fetch_raster(ranges, obj):
+    # read raster chunks and JPEG thumbnail of all IFD concurrently
+    reads = []
+    for i in obj:
+        name, offsets, bytecounts = i._raster_layout()
+        if name is not None:
+            reads.extend(
+                ranges.fetch(start, end - start)
+                for start, end, chunks in ifd._plan_reads(
+                    offsets, bytecounts, ifd.READ_GAP
+                )
+            )
+        if "JPEGInterchangeFormat" in i:
+            reads.append(ranges.fetch(
+                i["JPEGInterchangeFormat"], i["JPEGInterchangeFormatLength"]
+            ))
+    await asyncio.gather(*reads)
+
+
+async def _fetch_segments(ranges, raster=False):
+    # read JPEG segments up to scan data, usually in one read
+    offset = 2
+    while True:
+        if ranges._find(offset, 4)[0] is None:
+            await ranges.fetch(offset, READ_AHEAD)
+        marker, count = _compiled(">HH").unpack(await ranges.fetch(offset, 4))
+        if marker == 0xffda:
+            if raster:
+                if ranges.size is None:
+                    raise IOError("source size is unknown")
+                await ranges.fetch(offset + 2, ranges.size - offset - 2)
+            return
+        elif marker == 0xffd9:
+            return
+        if ranges._find(offset + 4, count - 2)[0] is None:
+            await ranges.fetch(offset, max(READ_AHEAD, count + 2))
+        offset += 2 + count
+
+
+async def aopen(source, size=None, raster=False):
+    """
+    Return JpegFile or TiffFile read from an asynchronous source. Tag values
+    are read at once, raster or scan data only if `raster` is `True`.
+
+    ```python
+    >>> tif = await Tyf.aopen(reader, raster=True)
+    >>> tif.save("copy.tif")
+    ```
+
+    Arguments:
+        source: object with `async read_at(offset, size)` method
+        size (int): source size in bytes, default to `source.size` if any.
+                    It is needed to read JPEG files
+        raster (bool): if `True`, read raster data or JPEG scan data too
+    Returns:
+        `Tyf.TiffFile` or `Tyf.JpegFile`
+    """
+    ranges = _Ranges(
+        source, getattr(source, "size", None) if size is None else size
+    )
+    # BigTIFF header is the longest one
+    header = await ranges.fetch(0, 16)
+    first, = _compiled(">H").unpack(header[:2])
+
+    if first == 0xffd8:
+        await _fetch_segments(ranges, raster)
+        obj = JpegFile(ranges, lazy=True)
+    elif first in [0x4d4d, 0x4949]:
+        byteorder = "<" if first == 0x4949 else ">"
+        magic_number, = _compiled(byteorder + "H").unpack(header[2:4])
+        bigtiff = magic_number == 0x2B
+        next_ifd, = _compiled(byteorder + ("Q" if bigtiff else "L")).unpack(
+            header[8:16] if bigtiff else header[4:8]
+        )
+        # next IFD offset is only known once its parent is read
+        while next_ifd != 0:
+            next_ifd = await _fetch_IFD(ranges, next_ifd, byteorder, bigtiff)
+        obj = TiffFile(ranges)
+        if raster:
+            await _fetch_raster(ranges, obj)
+            for i in obj:
+                ifd._load_raster(i, ranges)
+    else:
+        raise InvalidFileError("file is not a valid JPEG nor TIFF image")
+
+    # there is no source file path to update
+    del obj._filename
+    return obj
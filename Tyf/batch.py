@@ -0,0 +1,147 @@
+# -*- encoding:utf-8 -*-
+"""
+Parallel metadata extraction over many TIFF or JPEG files.
+
+```python
+>>> from Tyf import batch
+>>> stats = {}
+>>> for result in batch.extract(
+...     glob.glob("test/*.jpg"), tags=["DateTime", "GPSLongitude"],
+...     stats=stats
+... ):
+...     print(result)
+{'path': 'test/IMG_TEST_001.jpg', 'tags': {'DateTime': datetime.datetime(...)}}
+{'path': 'test/bad.jpg', 'error': 'InvalidFileError: file is not a valid...'}
+...
+>>> stats
+{'files': 5, 'errors': 1, 'elapsed': 0.12, 'rate': 41.6}
+```
+"""
+
+import time
+import itertools
+import multiprocessing
+
+import Tyf
+from Tyf import tags as _tags
+
+try:
+    from concurrent import futures
+except ImportError:
+    futures = None
+
+#: default number of files sent to a worker at once
+CHUNK_SIZE = 64
+
+
+def read(path, tags=None, idx=0):
+    """
+    Read tag values from a TIFF or JPEG file. Any error raised while reading
+    is returned in the result instead of being raised.
+
+    Arguments:
+        path (string): file path
+        tags (list): tag names or numbers to extract, default to all tags
+        idx (int): IFD index in TIFF file
+    Returns:
+        `dict` with `path` and `tags` items or `path` and `error` items
+    """
+    result = {"path": path}
+    try:
+        obj = Tyf.open(path, lazy=True)
+        if isinstance(obj, Tyf.JpegFile):
+            ifd = obj.ifd[0] if hasattr(obj, "ifd") else None
+        else:
+            ifd = obj[idx]
+        values = {}
+        if ifd is None:
+            pass
+        elif tags is None:
+            for tag in ifd.tags():
+                values[tag.key] = tag.value
+        else:
+            for tag in tags:
+                key = _tags.lookup(tag)[1][0]
+                try:
+                    values[key] = ifd[key]
+                except KeyError:
+                    pass
+        result["tags"] = values
+    except Exception as error:
+        result["error"] = "%s: %s" % (error.__class__.__name__, error)
+    return result
+
+
+def _read_chunk(paths, tags=None, idx=0):
+    return [read(path, tags, idx) for path in paths]
+
+
+def extract(paths, tags=None, workers=None, chunksize=CHUNK_SIZE, stats=None,
+            idx=0):
+    """
+    Extract tag values from files using a process pool. Paths are sent to
+    workers by chunks and only a few chunks per worker are pending at once
+    so `paths` can be a lazy iterable over millions of files. Results are
+    yielded as soon as a chunk is done, not in `paths` order.
+
+    Arguments:
+        paths (iterable): file paths
+        tags (list): tag names or numbers to extract, default to all tags
+        workers (int): number of worker processes, default to CPU count. If
+                       `0`, files are read in the current process
+        chunksize (int): number of files sent to a worker at once
+        stats (dict): if given, filled with `files`, `errors`, `elapsed`
+                      seconds and `rate` in files per second
+        idx (int): IFD index in TIFF files
+    Returns:
+        iterator over `Tyf.batch.read` results
+    """
+    if tags is not None:
+        tags = list(tags)
+        # unknown tags raise here rather than failing every file
+        for tag in tags:
+            if _tags.lookup(tag)[0] is False:
+                raise KeyError("%r tag not defined" % (tag,))
+    paths = iter(paths)
+    chunks = iter(lambda: list(itertools.islice(paths, chunksize)), [])
+    start = time.time()
+    counts = {"files": 0, "errors": 0}
+
+    def collect(results):
+        for result in results:
+            counts["files"] += 1
+            counts["errors"] += "error" in result
+            if stats is not None:
+                elapsed = time.time() - start
+                stats.update(
+                    counts, elapsed=elapsed,
+                    rate=counts["files"] / elapsed if elapsed else 0.
+                )
+            yield result
+
+    if workers == 0 or futures is None:
+        for chunk in chunks:
+            for result in collect(_read_chunk(chunk, tags, idx)):
+                yield result
+        return
+
+    workers = workers or multiprocessing.cpu_count()
+    executor = futures.ProcessPoolExecutor(max_workers=workers)
+    pending = set()
+    try:
+        # keep two chunks per worker in flight
+        for chunk in itertools.islice(chunks, 2 * workers):
+            pending.add(executor.submit(_read_chunk, chunk, tags, idx))
+        while pending:
+            done, pending = futures.wait(
+                pending, return_when=futures.FIRST_COMPLETED
+            )
+            for chunk in itertools.islice(chunks, len(done)):
+                pending.add(executor.submit(_read_chunk, chunk, tags, idx))
+            for future in done:
+                for result in collect(future.result()):
+                    yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
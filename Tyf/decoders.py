@@ -4,8 +4,14 @@
 value to python one.
 """
 
+import array
 import datetime
 
+try:
+    unichr
+except NameError:
+    unichr = chr
+
 
 def _1(value):
     """
@@ -63,19 +69,63 @@ def _11(value):
 
 #: see Tyf.decoders._11
 _12 = _11
+#: see Tyf.decoders._1
+_16 = _1
+#: see Tyf.decoders._1
+_17 = _1
+#: see Tyf.decoders._1
+_18 = _1
 
 
 # PrivateTiffTag
 
+def _bytes(value):
+    # tag byte values as bytes, array-backed values are copied at once
+    if not isinstance(value, array.array) or value.typecode != "B":
+        value = array.array("B", value)
+    return value.tobytes() if hasattr(value, "tobytes") else value.tostring()
+
+
 def XPTitle(value):
-    return "".join(chr(e) for e in value[0::2]).replace("\x00", "")
+    if len(value) and max(value) > 0xff:
+        # former LONG encoding, one code point per pair of values
+        return u"".join(unichr(e) for e in value[0::2]).replace(u"\x00", u"")
+    data = _bytes(value)
+    return data[:len(data) // 2 * 2].decode(
+        "utf-16-le", "replace"
+    ).rstrip("\x00")
 
 
 XPComment = XPAuthor = XPKeywords = XPSubject = XPTitle
 
+# JIS X 0208 codes without escape sequence are EUC-JP ones without high bit
+_JIS = bytearray(range(256))
+_JIS[0x21:0x7f] = bytearray(range(0xa1, 0xff))
+_JIS = bytes(_JIS)
+
 
 def UserComment(value):
-    return value[8:].decode("ascii", errors="ignore")
+    code, data = bytes(value[:8]), bytes(value[8:])
+    if code == b"UNICODE\x00":
+        if data[:2] in (b"\xff\xfe", b"\xfe\xff"):
+            text = data[:len(data) // 2 * 2].decode("utf-16", "replace")
+        else:
+            # byte order is the TIFF one, guess it from the null high bytes
+            # of latin characters
+            little = data[1::2].count(b"\x00") >= data[0::2].count(b"\x00")
+            text = data[:len(data) // 2 * 2].decode(
+                "utf-16-le" if little else "utf-16-be", "replace"
+            )
+    elif code == b"JIS\x00\x00\x00\x00\x00":
+        try:
+            text = data.decode("iso2022_jp")
+        except UnicodeError:
+            text = data.translate(_JIS).decode("euc_jp", "replace")
+    elif code == b"\x00" * 8:
+        text = data.decode("utf-8", "ignore")
+    else:
+        text = data.decode("ascii", "ignore")
+    return text.rstrip("\x00")
 
 
 # ExifTag
@@ -1,9 +1,9 @@
 # -*- encoding:utf-8 -*-
 
-from Tyf import reduce
+from Tyf import ARRAY_TYPES
 
 import math
-import fractions
+import array
 
 
 _m_u_short = 0
@@ -12,6 +12,8 @@ _m_u_byte = 0
 _M_u_byte = 2**16
 _m_u_long = 0
 _M_u_long = 2**32
+_m_u_long8 = 0
+_M_u_long8 = 2**64
 
 _m_s_short = -_M_u_short / 2
 _M_s_short = _M_u_short / 2 - 1
@@ -19,6 +21,8 @@ _m_s_byte = -_M_u_byte / 2
 _M_s_byte = _M_u_byte / 2 - 1
 _m_s_long = -_M_u_long / 2
 _M_s_long = _M_u_long / 2 - 1
+_m_s_long8 = -_M_u_long8 // 2
+_M_s_long8 = _M_u_long8 // 2 - 1
 
 _m_float = -1.17549e38
 _M_float = 3.40282e38
@@ -40,8 +44,27 @@ def in_range(value, mini, maxi, cast=int):
         )
 
 
+def _array(value, typ, mini, maxi):
+    # bulk range check and conversion of array-backed values
+    if len(value) and not (mini <= min(value) and max(value) < maxi):
+        raise EncodingException(
+            "[%r:%r] not in range [%r:%r[" % (
+                min(value), max(value), mini, maxi
+            )
+        )
+    code = ARRAY_TYPES[typ]
+    # float items are cast as tuple items are in `in_range`
+    if value.typecode in "fd" and code not in "fd":
+        return array.array(code, (int(v) for v in value))
+    # caller array is copied so the tag only changes through its encoder
+    else:
+        return array.array(code, value)
+
+
 def _1(value):
-    if isinstance(value, tuple):
+    if isinstance(value, array.array):
+        return _array(value, 1, _m_u_short, _M_u_short)
+    elif isinstance(value, tuple):
         return tuple(in_range(v, _m_u_short, _M_u_short) for v in value)
     else:
         return (in_range(value, _m_u_short, _M_u_short), )
@@ -62,42 +85,88 @@ def _2(value):
 
 
 def _3(value):
-    if isinstance(value, tuple):
+    if isinstance(value, array.array):
+        return _array(value, 3, _m_u_byte, _M_u_byte)
+    elif isinstance(value, tuple):
         return tuple(in_range(v, _m_u_byte, _M_u_byte) for v in value)
     else:
         return (in_range(value, _m_u_byte, _M_u_byte), )
 
 
 def _4(value):
-    if isinstance(value, tuple):
+    if isinstance(value, array.array):
+        return _array(value, 4, _m_u_long, _M_u_long)
+    elif isinstance(value, tuple):
         return tuple(in_range(v, _m_u_long, _M_u_long) for v in value)
     else:
         return (in_range(value, _m_u_long, _M_u_long), )
 
 
-def _rational_yielder(*values):
-    cnt = 0
+#: biggest denominator used to encode float as rational number
+MAX_DENOMINATOR = 10000000
+
+
+def _limit_denominator(n, d, max_denominator=MAX_DENOMINATOR):
+    # closest fraction to n/d with a denominator not bigger than
+    # max_denominator, same continued fraction algorithm and result than
+    # fractions.Fraction.limit_denominator
+    n0, d0 = n, d
+    p0, q0, p1, q1 = 0, 1, 1, 0
+    while d:
+        a = n // d
+        q2 = q0 + a * q1
+        if q2 > max_denominator:
+            break
+        p0, q0, p1, q1 = p1, q1, p0 + a * p1, q2
+        n, d = d, n - a * d
+    else:
+        # exact value, last convergent is the irreducible fraction
+        return p1, q1
+    k = (max_denominator - q0) // q1
+    p2, q2 = p0 + k * p1, q0 + k * q1
+    # convergent is returned if as close as the semi convergent
+    if abs(p1 * d0 - n0 * q1) * q2 <= abs(p2 * d0 - n0 * q2) * q1:
+        return p1, q1
+    return p2, q2
+
+
+def _float_ratio(value):
+    # float is encoded from its decimal representation, 0.1 gives 1/10
+    mantissa, _, exponent = str(value).partition("e")
+    integer, _, decimals = mantissa.partition(".")
+    n, d = int(integer + decimals), 10 ** len(decimals)
+    exponent = int(exponent or 0)
+    if exponent > 0:
+        n *= 10 ** exponent
+    else:
+        d *= 10 ** -exponent
+    return _limit_denominator(n, d)
+
+
+def _rationals(values):
+    # flat numerator and denominator list, integers are used as is
+    result = []
     for v in values:
         if isinstance(v, int):
-            cnt += 1
-            yield (v, )
+            result.append(v)
+        elif isinstance(v, float):
+            result.extend(_float_ratio(v))
         else:
-            if isinstance(v, float):
-                v = str(v)
-            f = fractions.Fraction(v).limit_denominator(10000000)
-            cnt += 2
-            yield (f.numerator, f.denominator)
-
-    if cnt % 2:
-        yield (1, )
+            import fractions
+            f = fractions.Fraction(v).limit_denominator(MAX_DENOMINATOR)
+            result.extend((f.numerator, f.denominator))
+    if len(result) % 2:
+        result.append(1)
+    return result
 
 
 def _5(value):
-    if not isinstance(value, tuple):
+    if not isinstance(value, (tuple, array.array)):
         value = (value, )
     try:
-        reduced = reduce(tuple.__add__, _rational_yielder(*value))
-        return tuple(in_range(v, _m_u_long, _M_u_long) for v in reduced)
+        return tuple(
+            in_range(v, _m_u_long, _M_u_long) for v in _rationals(value)
+        )
     except Exception:
         raise EncodingException(
             "%s can not be encoded as unsigned rational number(s)" % (value, )
@@ -105,7 +174,9 @@ def _5(value):
 
 
 def _6(value):
-    if isinstance(value, tuple):
+    if isinstance(value, array.array):
+        return _array(value, 6, _m_s_short, _M_s_short)
+    elif isinstance(value, tuple):
         return tuple(in_range(v, _m_s_short, _M_s_short) for v in value)
     else:
         return (in_range(value, _m_s_short, _M_s_short), )
@@ -118,33 +189,40 @@ def _7(value):
 
 
 def _8(value):
-    if isinstance(value, tuple):
+    if isinstance(value, array.array):
+        return _array(value, 8, _m_s_byte, _M_s_byte)
+    elif isinstance(value, tuple):
         return tuple(in_range(v, _m_s_byte, _M_s_byte) for v in value)
     else:
         return (in_range(value, _m_s_byte, _M_s_byte), )
 
 
 def _9(value):
-    if isinstance(value, tuple):
+    if isinstance(value, array.array):
+        return _array(value, 9, _m_s_long, _M_s_long)
+    elif isinstance(value, tuple):
         return tuple(in_range(v, _m_s_long, _M_s_long) for v in value)
     else:
         return (in_range(value, _m_s_long, _M_s_long), )
 
 
 def _10(value):
-    if not isinstance(value, tuple):
+    if not isinstance(value, (tuple, array.array)):
         value = (value, )
     try:
-        reduced = reduce(tuple.__add__, _rational_yielder(*value))
-        return tuple(in_range(v, _m_s_long, _M_s_long) for v in reduced)
+        return tuple(
+            in_range(v, _m_s_long, _M_s_long) for v in _rationals(value)
+        )
     except Exception:
         raise EncodingException(
-            "%s can not be encoded as unsigned rational number(s)" % (value, )
+            "%s can not be encoded as signed rational number(s)" % (value, )
         )
 
 
 def _11(value):
-    if isinstance(value, tuple):
+    if isinstance(value, array.array):
+        return _array(value, 11, _m_float, _M_float)
+    elif isinstance(value, tuple):
         return tuple(
             in_range(v, _m_float, _M_float, cast=float) for v in value
         )
@@ -153,7 +231,9 @@ def _11(value):
 
 
 def _12(value):
-    if isinstance(value, tuple):
+    if isinstance(value, array.array):
+        return _array(value, 12, _m_double, _M_double)
+    elif isinstance(value, tuple):
         return tuple(
             in_range(v, _m_double, _M_double, cast=float) for v in value
         )
@@ -161,20 +241,60 @@ def _12(value):
         return (in_range(value, _m_double, _M_double, cast=float), )
 
 
+def _16(value):
+    if isinstance(value, array.array):
+        return _array(value, 16, _m_u_long8, _M_u_long8)
+    elif isinstance(value, tuple):
+        return tuple(in_range(v, _m_u_long8, _M_u_long8) for v in value)
+    else:
+        return (in_range(value, _m_u_long8, _M_u_long8), )
+
+
+def _17(value):
+    if isinstance(value, array.array):
+        return _array(value, 17, _m_s_long8, _M_s_long8)
+    elif isinstance(value, tuple):
+        return tuple(in_range(v, _m_s_long8, _M_s_long8) for v in value)
+    else:
+        return (in_range(value, _m_s_long8, _M_s_long8), )
+
+
+_18 = _16
+
+
 # PrivateTiffTag:
 
 def XPTitle(value):
-    return reduce(tuple.__add__, [(ord(e), 0) for e in value]) + (0, 0)
+    # null terminated UTF-16LE string stored as an array of bytes, packed
+    # as is
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    return array.array("B", value.encode("utf-16-le") + b"\x00\x00")
 
 
 XPComment = XPAuthor = XPKeywords = XPSubject = XPTitle
 
+#: UserComment character code by charset
+CHARSETS = {
+    "ascii": b"ASCII\x00\x00\x00",
+    "jis": b"JIS\x00\x00\x00\x00\x00",
+    "unicode": b"UNICODE\x00",
+    "undefined": b"\x00" * 8,
+}
+
 
 def UserComment(value):
-    return b"ASCII\x00\x00\x00" + (
-        value.encode("ascii", errors="replace")
-        if not isinstance(value, bytes) else value
-    )
+    # text is written as ASCII if possible, else as UTF-16LE whatever the
+    # byte order of the saved file (Tyf decoder guesses it when reading).
+    # Bytes starting with a character code are kept as is.
+    if isinstance(value, bytes):
+        if value[:8] in CHARSETS.values():
+            return value
+        return CHARSETS["ascii"] + value
+    try:
+        return CHARSETS["ascii"] + value.encode("ascii")
+    except UnicodeError:
+        return CHARSETS["unicode"] + value.encode("utf-16-le")
 
 
 # ExifTag:
@@ -1,6 +1,8 @@
 # -*- encoding: utf-8 -*-
 
-from Tyf import values, __geotiff__
+import bisect
+
+from Tyf import __geotiff__, _table
 
 
 _TAGS = {
@@ -62,13 +64,106 @@ _2TAG = dict((v[0], t) for t, v in _TAGS.items())
 _2KEY = dict((v, k) for k, v in _2TAG.items())
 
 
+class ValueIndex(object):
+    """
+    Bidirectional index of a `Tyf.values` table with case insensitive
+    prefix search of value names. Indexes are built once per table and
+    shared, use `Tyf.gkd.index` to get them.
+
+    ```python
+    >>> idx = gkd.index("ProjectedCSTypeGeoKey")
+    >>> idx.table[32631]
+    'WGS 84 / UTM zone 31N'
+    >>> idx.reverse['WGS 84 / UTM zone 31N']
+    32631
+    >>> idx.search("wgs 84 / utm zone 31", limit=2)
+    [(32631, 'WGS 84 / UTM zone 31N'), (32731, 'WGS 84 / UTM zone 31S')]
+    ```
+    """
+    __slots__ = ("table", "reverse", "_names", "_items")
+
+    def __init__(self, table):
+        #: value code to name mapping
+        self.table = table
+        #: value name to code mapping
+        self.reverse = dict((v, k) for k, v in table.items())
+        # lower case names sorted for prefix search
+        entries = sorted(
+            (v.lower(), v, k) for k, v in table.items()
+            if isinstance(v, (str, type(u"")))
+        )
+        self._names = [entry[0] for entry in entries]
+        self._items = [(entry[2], entry[1]) for entry in entries]
+
+    def search(self, prefix, limit=None):
+        """
+        Return (code, name) pairs which name starts with `prefix`, case
+        insensitive, sorted by name.
+
+        Arguments:
+            prefix (str): name prefix
+            limit (int): maximum number of pairs returned
+        Returns:
+            `list` of (code, name) pairs
+        """
+        prefix = prefix.lower()
+        result = []
+        i = bisect.bisect_left(self._names, prefix)
+        while i < len(self._names) and self._names[i].startswith(prefix):
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(self._items[i])
+            i += 1
+        return result
+
+
+# value indexes by GeoKey name
+_INDEXES = {}
+
+
+def index(key):
+    """
+    Return shared `Tyf.gkd.ValueIndex` of a GeoKey value table.
+
+    Arguments:
+        key (str or int): GeoKey name or number
+    Returns:
+        `Tyf.gkd.ValueIndex`
+    """
+    key = _TAGS[key][0] if key in _TAGS else key
+    try:
+        return _INDEXES[key]
+    except KeyError:
+        return _INDEXES.setdefault(key, ValueIndex(_table(key)))
+
+
+def search(key, prefix, limit=None):
+    """
+    Return (code, name) pairs of GeoKey values which name starts with
+    `prefix`, case insensitive.
+
+    ```python
+    >>> gkd.search("GeographicTypeGeoKey", "ntf")
+    [(4275, 'NTF'), (62756405, 'NTF (deg)'), (4807, 'NTF (Paris)')]
+    ```
+
+    Arguments:
+        key (str or int): GeoKey name or number
+        prefix (str): name prefix
+        limit (int): maximum number of pairs returned
+    Returns:
+        `list` of (code, name) pairs
+    """
+    return index(key).search(prefix, limit)
+
+
 class GkdTag:
     #: 
     strict = True
     #: 
     info = property(
-        lambda cls: getattr(
-            values, _2KEY.get(cls.tag, cls.key), {}
+        lambda cls: _table(
+            _2KEY.get(cls.tag, cls.key)
         ).get(cls._decode(), None),
         None,
         None,
@@ -82,10 +177,10 @@ class GkdTag:
         value = default if value is None else value
 
         self.tag = tag
-        restricted = getattr(values, self.key, {})
+        values = index(self.key)
+        restricted, reverse = values.table, values.reverse
 
         if restricted:
-            reverse = dict((v, k) for k, v in restricted.items())
             if value in restricted:
                 self.meaning = restricted.get(value)
             elif value in reverse:
@@ -127,27 +222,43 @@ class GkdTag:
 class Gkd(dict):
     version = __geotiff__[0]
     revision = __geotiff__[1:]
+    #: `True` if GeoKeys changed since directory was parsed
+    dirty = False
 
     def __getitem__(self, tag):
         return dict.__getitem__(self, _2TAG.get(tag, tag))._decode()
 
     def __setitem__(self, tag, value):
-        dict.__setitem__(self, _2TAG.get(tag, tag), GkdTag(tag, value))
+        tag = _2TAG.get(tag, tag)
+        dict.__setitem__(self, tag, GkdTag(tag, value))
+        self.dirty = True
+
+    def __delitem__(self, tag):
+        dict.__delitem__(self, _2TAG.get(tag, tag))
+        self.dirty = True
+
+    def pop(self, tag, *default):
+        self.dirty = True
+        return dict.pop(self, _2TAG.get(tag, tag), *default)
 
     def compute(self):
         directory_tags = (self.version, ) + self.revision + (len(self), )
         double_params = ()
         ascii_params = b""
         for tag in self.tags():
-            directory_tags += (tag.tag, tag.type, tag.count)
             if tag.type == 34736:
+                directory_tags += (
+                    tag.tag, tag.type, tag.count, len(double_params)
+                )
                 double_params += tag.value
-                directory_tags += (len(double_params)-1, )
             elif tag.type == 34737:
-                directory_tags += (len(ascii_params), )
+                # ascii count includes the "|" terminator
+                directory_tags += (
+                    tag.tag, tag.type, len(tag.value) + 1, len(ascii_params)
+                )
                 ascii_params += tag.value + b"|"
             else:
-                directory_tags += tag.value
+                directory_tags += (tag.tag, tag.type, tag.count) + tag.value
         self._34735 = directory_tags
         self._34736 = double_params
         self._34737 = ascii_params
@@ -161,15 +272,16 @@ class Gkd(dict):
     @staticmethod
     def from_ifd(dic={}, **kw):
         cls = Gkd()
-        pairs = dict(dic, **kw)
+        # do not copy Ifd, it would read all lazy tag values
+        pairs = dict(dic, **kw) if kw else dic
         if "GeoDoubleParamsTag" in pairs:
-            _34736 = dic["GeoDoubleParamsTag"]
+            _34736 = pairs["GeoDoubleParamsTag"]
         if "GeoAsciiParamsTag" in pairs:
-            _34737 = dic["GeoAsciiParamsTag"]
+            _34737 = pairs["GeoAsciiParamsTag"]
         if "GeoKeyDirectoryTag" in pairs:
-            _34735 = dic["GeoKeyDirectoryTag"]
+            _34735 = pairs["GeoKeyDirectoryTag"]
             cls.version = _34735[0]
-            cls.revision = _34735[1:3]
+            cls.revision = tuple(_34735[1:3])
             for (tag, typ, count, value) in zip(
                 _34735[4::4], _34735[5::4], _34735[6::4], _34735[7::4]
             ):
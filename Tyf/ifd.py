@@ -1,17 +1,19 @@
 # -*- encoding:utf-8 -*-
 
 import io
-import struct
+import sys
+import mmap
+import array
+import contextlib
 import collections
 
-from Tyf import TYPES, reduce
-from Tyf import tags, encoders, decoders, values
+from Tyf import TYPES, IFD_FORMATS, ARRAY_TYPES
+from Tyf import _compiled, _value_struct, _entry_struct, _table
+from Tyf import tags, encoders, decoders
 
 try:
-    from urllib.request import urlopen
     from io import BytesIO as StringIO
 except ImportError:
-    from urllib import urlopen
     from cStringIO import StringIO
 
 
@@ -73,7 +75,251 @@ def Transform(obj, x=0., y=0., z=0.):
     )
 
 
+def Inverse(obj):
+    """
+    Return the inverse of a model transformation matrix, transforming model
+    coordinates back to raster space. If the matrix has no altitude scale
+    (`ModelPixelScaleTag` with null `ScaleZ`), raster altitude is `0.`.
+
+    ```python
+    >>> inv = ifd.Inverse(matrix)
+    >>> ifd.Transform(inv, *ifd.Transform(matrix, 10, 10))
+    (10.0, 10.0, 0.0)
+    ```
+
+    Arguments:
+        obj (GeoKeyModel["ModelTransformationTag"]): transformation matrix
+    Returns:
+        GeoKeyModel["ModelTransformationTag"]
+    Raises:
+        ValueError if matrix is not invertible
+    """
+    a, b, c, d, e, f, g, h, i, j, k, l = obj[:12]
+    det = a * (f * k - g * j) - b * (e * k - g * i) + c * (e * j - f * i)
+    if det != 0.:
+        inv = [
+            (f * k - g * j) / det, (c * j - b * k) / det,
+            (b * g - c * f) / det,
+            (g * i - e * k) / det, (a * k - c * i) / det,
+            (c * e - a * g) / det,
+            (e * j - f * i) / det, (b * i - a * j) / det,
+            (a * f - b * e) / det,
+        ]
+    elif i == j == k == 0.:
+        det = a * f - b * e
+        if det == 0.:
+            raise ValueError("transformation matrix is not invertible")
+        inv = [f / det, -b / det, 0., -e / det, a / det, 0., 0., 0., 0.]
+        l = 0.
+    else:
+        raise ValueError("transformation matrix is not invertible")
+    return GeoKeyModel["ModelTransformationTag"](
+        inv[0], inv[1], inv[2], 0. - (inv[0] * d + inv[1] * h + inv[2] * l),
+        inv[3], inv[4], inv[5], 0. - (inv[3] * d + inv[4] * h + inv[5] * l),
+        inv[6], inv[7], inv[8], 0. - (inv[6] * d + inv[7] * h + inv[8] * l),
+        0., 0., 0., 1.
+    )
+
+
+#: Set to `False` to use `array` based transformations even if numpy is
+#: installed
+USE_NUMPY = True
+# numpy module once imported, None if not installed
+_NUMPY = []
+
+
+def _numpy():
+    # numpy is only imported when first needed
+    if not USE_NUMPY:
+        return None
+    if not _NUMPY:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _NUMPY.append(numpy)
+    return _NUMPY[0]
+
+
+def _affine(a, b, c, d, x, y, z=None):
+    # a*x + b*y + c*z + d over arrays of doubles, null terms being skipped
+    terms = [(k, v) for k, v in [(a, x), (b, y), (c, z)] if k and v is not None]
+    if len(terms) == 0:
+        return array.array("d", [d]) * len(x)
+    elif len(terms) == 1:
+        (k, u), = terms
+        return array.array("d", [k * i + d for i in u])
+    elif len(terms) == 2:
+        (k, u), (m, v) = terms
+        return array.array("d", [k * i + m * j + d for i, j in zip(u, v)])
+    return array.array(
+        "d", [a * i + b * j + c * n + d for i, j, n in zip(x, y, z)]
+    )
+
+
+def TransformArray(obj, x, y, z=None):
+    """
+    Transformation of many points between raster and model space, see
+    `Tyf.ifd.Transform`. Computation uses numpy if installed, else python
+    `array`.
+
+    ```python
+    >>> X, Y, Z = ifd.TransformArray(matrix, [0, 10, 20], [0, 10, 20])
+    >>> X
+    array('d', [-28493.166784412522, -27892.945414580587, ...])
+    ```
+
+    Arguments:
+        obj (GeoKeyModel["ModelTransformationTag"]): transformation matrix
+        x (sequence or buffer): pixel column indexes from left
+        y (sequence or buffer): pixel row indexes from top
+        z (sequence or buffer): altitude values, default to `0.`
+    Returns:
+        projeted coordinates X, Y, Z as `numpy.ndarray` or `array.array`
+    """
+    numpy = _numpy()
+    if numpy is not None:
+        x = numpy.asarray(x, dtype=float)
+        y = numpy.asarray(y, dtype=float)
+        z = numpy.zeros(len(x)) if z is None else \
+            numpy.asarray(z, dtype=float)
+        return tuple(
+            obj[r] * x + obj[r + 1] * y + obj[r + 2] * z + obj[r + 3]
+            for r in [0, 4, 8]
+        )
+    x, y = array.array("d", x), array.array("d", y)
+    if z is not None:
+        z = array.array("d", z)
+    return tuple(_affine(*(obj[r:r + 4] + (x, y, z))) for r in [0, 4, 8])
+
+
+def _grid(obj, width, row, count, center):
+    # model coordinates of pixel centres from `count` raster rows
+    a, b, c, d, e, f, g, h = obj[:8]
+    numpy = _numpy()
+    if numpy is not None:
+        x = numpy.arange(width) + center
+        y = numpy.arange(row, row + count) + center
+        X = (a * x)[numpy.newaxis, :] + (b * y + d)[:, numpy.newaxis]
+        Y = (e * x)[numpy.newaxis, :] + (f * y + h)[:, numpy.newaxis]
+        return X.ravel(), Y.ravel()
+    x = [col + center for col in range(width)]
+    ys = [r + center for r in range(row, row + count)]
+    X, Y = array.array("d"), array.array("d")
+    # rows of axis aligned rasters differ by a constant
+    if b == 0.:
+        X = array.array("d", [a * i + d for i in x]) * count
+    else:
+        ax = [a * i for i in x]
+        for j in ys:
+            bj = b * j + d
+            X.extend(array.array("d", [i + bj for i in ax]))
+    if e == 0.:
+        for j in ys:
+            Y.extend(array.array("d", [f * j + h]) * width)
+    else:
+        ex = [e * i for i in x]
+        for j in ys:
+            fj = f * j + h
+            Y.extend(array.array("d", [i + fj for i in ex]))
+    return X, Y
+
+
+# encoder and decoder cache by module, tag key and tag type
+_CODECS = {}
+
+
+def _codec(module, key, typ):
+    # return tag specific encoder or decoder if any else type one
+    try:
+        return _CODECS[(module, key, typ)]
+    except KeyError:
+        return _CODECS.setdefault(
+            (module, key, typ),
+            getattr(module, key, getattr(module, "_%s" % typ))
+        )
+
+
+# decoders returning the python numbers found in raw value
+_NUMERIC_DECODERS = set([decoders._1, decoders._11])
+
+#: Numeric tag values with more items are read and stored as `array.array`
+#: instead of tuples (e.g. StripOffsets, TileOffsets, ModelTiepointTag...).
+#: Their `Tag.value` is then a copy of the array, a tuple below this count
+ARRAY_COUNT = 64
+
+_NATIVE = "<" if sys.byteorder == "little" else ">"
+
+
+def _unpack_at(fmt, fileobj, offset):
+    # unpack compiled struct directly from memory map, else seek and read
+    # file object
+    if isinstance(fileobj, mmap.mmap):
+        return fmt.unpack_from(fileobj, offset)
+    fileobj.seek(offset)
+    return fmt.unpack(fileobj.read(fmt.size))
+
+
+def _read_at(fileobj, offset, size):
+    # memory map is sliced without copy, else seek and read file object
+    if isinstance(fileobj, mmap.mmap):
+        return memoryview(fileobj)[offset:offset + size]
+    fileobj.seek(offset)
+    return fileobj.read(size)
+
+
+def _array_at(typ, byteorder, fileobj, offset, size):
+    # copy raw bytes into a typed array, swapping them if not in native order
+    value = array.array(ARRAY_TYPES[typ])
+    data = _read_at(fileobj, offset, size)
+    if hasattr(value, "frombytes"):
+        value.frombytes(data)
+    else:  # python 2.x
+        value.fromstring(bytes(data))
+    if byteorder != _NATIVE:
+        value.byteswap()
+    return value
+
+
+def _pack_array(value, typ, byteorder):
+    # pack array directly from its buffer, byte order does not matter for
+    # single byte items
+    code = ARRAY_TYPES[typ]
+    swap = byteorder != _NATIVE and array.array(code).itemsize > 1
+    if value.typecode != code or swap:
+        value = array.array(code, value)
+        if swap:
+            value.byteswap()
+    return value.tobytes() if hasattr(value, "tobytes") else value.tostring()
+
+
+def _is_inline(entry, byteorder):
+    # True if tag value fits in IFD entry value_or_offset field
+    tag, typ, count, value_or_offset = entry
+    return _value_struct(byteorder, typ, count).size <= len(value_or_offset)
+
+
+def _info(tag):
+    try:
+        return _table(tag.key).get(tag.value, None)
+    # array-backed value is not hashable
+    except TypeError:
+        return None
+
+
 class Tag(object):
+    # tag definition (key, types, default, comment) is shared with
+    # `Tyf.tags` registry, only tag number, type and values are stored
+    __slots__ = ("tag", "type", "_definition", "_raw", "_value")
+
+    #: Tag keyword
+    key = property(lambda cls: cls._definition[0], None, None, "")
+    _types = property(lambda cls: cls._definition[1], None, None, "")
+    #: Tag default value
+    default = property(lambda cls: cls._definition[2], None, None, "")
+    #: Tag description
+    comment = property(lambda cls: cls._definition[3], None, None, "")
+
     #: Encode and decode on the fly the `_v` attribute (see `Tyf.encoders` and
     #: `Tyf.decoders` modules).
     #: ```python
@@ -84,12 +330,21 @@ class Tag(object):
     #: >>> tag.value
     #: 5.62347
     #: ```
+    #: Numeric values with more than `Tyf.ifd.ARRAY_COUNT` items are returned
+    #: as a copy of the stored `array.array` instead of a tuple.
     value = property(
         lambda cls: cls._getvalue(),
         lambda cls, v: cls._setvalue(v),
         None,
         ""
     )
+    #: Raw value, setting it clears the decoded value cache.
+    _v = property(
+        lambda cls: cls._raw,
+        lambda cls, v: cls._setraw(v),
+        None,
+        ""
+    )
     count = property(
         lambda cls:
             len(getattr(cls, "_v", (None, ))) //
@@ -106,38 +361,41 @@ class Tag(object):
     #: 'Flash fired, compulsory flash mode, return light detected'
     #: ```
     info = property(
-        lambda cls: getattr(values, cls.key, {}).get(cls.value, None),
+        lambda cls: _info(cls),
         None,
         None,
         ""
     )
 
     def _getvalue(self):
-        if not hasattr(self, "_decode"):
-            setattr(
-                self, "_decode", getattr(
-                    decoders, self.key, getattr(
-                        decoders, "_%s" % self.type
-                    )
-                )
-            )
-        if hasattr(self, "_v"):
-            return self._decode(self._v)
-        return None
+        # decoded value is computed once and kept until raw value changes
+        try:
+            return self._value
+        except AttributeError:
+            if not hasattr(self, "_raw"):
+                return None
+        decode = _codec(decoders, self.key, self.type)
+        # integer and float raw values are already python numbers, so the
+        # immutable raw tuple is returned as is. Array is mutable, a copy is
+        # returned so the tag only changes through its encoder
+        if decode in _NUMERIC_DECODERS and \
+           isinstance(self._raw, (tuple, array.array)) and len(self._raw) > 1:
+            if isinstance(self._raw, array.array):
+                return self._raw[:]
+            self._value = self._raw
+        else:
+            self._value = decode(self._raw)
+        return self._value
+
+    def _setraw(self, raw):
+        self._raw = raw
+        try:
+            del self._value
+        except AttributeError:
+            pass
 
     def _setvalue(self, value):
-        if not hasattr(self, "_encode"):
-            setattr(
-                self, "_encode", getattr(
-                    encoders, self.key, getattr(
-                        encoders, "_%s" % self.type
-                    )
-                )
-            )
-        self._v = self._encode(value)
-        self._is_offset = self.count * struct.calcsize(
-            "=" + TYPES[self.type][0]
-        ) > 4
+        self._v = _codec(encoders, self.key, self.type)(value)
 
     def __init__(self, tag_or_key, value=None):
         """
@@ -147,8 +405,8 @@ class Tag(object):
                          default value if anyone is defined else `_v` attribute
                          is not created
         """
-        self.tag, (self.key, self._types, default, self.comment) = \
-            tags.get(tag_or_key)
+        self.tag, self._definition = tags.get(tag_or_key)
+        default = self.default
         self.type = self._types[-1]
         if value or default:
             self.value = value or default
@@ -160,7 +418,7 @@ class Tag(object):
             return "<IFD tag %s:%r>" % (self.key, self.value)
 
     @staticmethod
-    def read(fileobj, byteorder, db=None):
+    def read(fileobj, byteorder, db=None, bigtiff=False):
         """
         Extract an IFD tag from buffer current position. Buffer position is
         adjusted to the end of IFD entry before returning the value.
@@ -169,38 +427,53 @@ class Tag(object):
             fileobj (buffer): a python file object
             byteorder (string): `">"` if big-endian used else `"<"`
             db (dict): authorized tag database
+            bigtiff (bool): `True` if BigTIFF IFD entry
         Returns:
             `Tyf.ifd.Tag`
         """
-        # read tag, type and count
-        fmt = byteorder + "HHL"
-        tag, typ, cnt = struct.unpack(
-            fmt, fileobj.read(struct.calcsize(fmt))
-        )
-        cls = Tag(tag)
-        cls.key, cls._types, cls.default, cls.comment = tags.get(tag)[-1]
+        # read tag, type, count and value_or_offset
+        fmt = _entry_struct(byteorder, bigtiff)
+        entry = fmt.unpack(fileobj.read(fmt.size))
+        # keep the end of tag definition position
+        bckp = fileobj.tell()
+        cls = Tag.from_entry(entry, byteorder, fileobj)
+        # go back to end of tag definition position
+        fileobj.seek(bckp)
+        return cls
+
+    @staticmethod
+    def from_entry(entry, byteorder, fileobj=None):
+        """
+        Build an IFD tag from an unpacked IFD entry. Buffer is only used if
+        tag value does not fit in the entry.
+
+        Arguments:
+            entry (tuple): tag, type, count and value_or_offset (4 bytes or 8
+                           bytes for BigTIFF)
+            byteorder (string): `">"` if big-endian used else `"<"`
+            fileobj (buffer): a python file object
+        Returns:
+            `Tyf.ifd.Tag`
+        """
+        tag, typ, cnt, value_or_offset = entry
+        # no need to initialize default value
+        cls = Tag.__new__(Tag)
+        cls.tag, cls._definition = tags.get(tag)
         cls.type = typ
-        # extract value_or_offset
-        value_or_offset = fileobj.read(struct.calcsize("=L"))
         if not isinstance(value_or_offset, bytes):
             value_or_offset = value_or_offset.encode("utf-8")
         # prepare structure value
-        _typ = TYPES[typ][0]
-        fmt = byteorder + ("%ds" % cnt if _typ == "s" else cnt * _typ)
-        type_size = struct.calcsize("=" + _typ)
-        data_size = cnt * type_size
-        if data_size > 4:
-            cls._is_offset = True
-            # keep the end of tag definition position
-            bckp = fileobj.tell()
-            offset, = struct.unpack(byteorder+"L", value_or_offset)
-            fileobj.seek(offset)
-            value = struct.unpack(fmt, fileobj.read(struct.calcsize(fmt)))
-            # go back to end of tag definition position
-            fileobj.seek(bckp)
+        fmt = _value_struct(byteorder, typ, cnt)
+        if fmt.size > len(value_or_offset):
+            offset, = _compiled(
+                byteorder + IFD_FORMATS[len(value_or_offset) == 8][-1]
+            ).unpack(value_or_offset)
+            if cnt > ARRAY_COUNT and typ in ARRAY_TYPES:
+                value = _array_at(typ, byteorder, fileobj, offset, fmt.size)
+            else:
+                value = _unpack_at(fmt, fileobj, offset)
         else:
-            cls._is_offset = False
-            value = struct.unpack(fmt, value_or_offset[:data_size])
+            value = fmt.unpack_from(value_or_offset)
         # store raw value
         if typ in [2, 7]:
             # python 3.x
@@ -216,9 +489,9 @@ class Tag(object):
         """
         Return tag value size in `bytes` when packed.
         """
-        return struct.calcsize("=" + TYPES[self.type][0] * self.count)
+        return _value_struct("=", self.type, self.count).size
 
-    def pack(self, byteorder):
+    def pack(self, byteorder, bigtiff=False):
         """
         Return a tuple containing packed IFD base entry [tag, type, count],
         packed value and the info if value have to be written in IFD entry or
@@ -238,67 +511,106 @@ class Tag(object):
 
         Arguments:
             byteorder (string): `">"` if big-endian used else `"<"`
+            bigtiff (bool): `True` to pack a BigTIFF IFD entry
         Returns:
             packed ifd entry - packed value - is offset boolean
         """
         tag, typ, cnt = self.tag, self.type, self.count
-        info = struct.pack(byteorder + "HHL", tag, typ, cnt)
-        typ_ = TYPES[typ][0]
-        fmt = \
-            byteorder + ("%ds" % cnt if typ_ == "s" else cnt * typ_)
+        _cnt, _entry, _ofs = IFD_FORMATS[bigtiff]
+        info = _compiled(byteorder + _entry).pack(tag, typ, cnt)
+        fmt = _value_struct(byteorder, typ, cnt)
         packed = \
-            struct.pack(fmt, self._v) if typ_ == "s" else \
-            struct.pack(fmt, *self._v)
-        value_is_offset = getattr(self, "_is_offset", False)
+            fmt.pack(self._v) if TYPES[typ][0] == "s" else \
+            _pack_array(self._v, typ, byteorder) \
+            if isinstance(self._v, array.array) else \
+            fmt.pack(*self._v)
+        size = _compiled("=" + _ofs).size
+        value_is_offset = len(packed) > size
         return (
             info,
-            packed if value_is_offset else packed.ljust(4, b"\x00"),
+            packed if value_is_offset else packed.ljust(size, b"\x00"),
             value_is_offset
         )
 
 
-# for speed reason : load raster only if asked or if needed
-def _load_raster(obj, fileobj):
-    # striped raster data
-    if "StripOffsets" in obj:
-        setattr(obj, "stripes", tuple())
-        offsets = obj["StripOffsets"]
-        bytescounts = obj["StripByteCounts"]
-        if isinstance(offsets, tuple):
-            data = zip(offsets, bytescounts)
-        else:
-            data = ((offsets, bytescounts), )
-        for offset, bytecount in data:
-            fileobj.seek(offset)
-            obj.stripes += (fileobj.read(bytecount), )
-    # free raster data
-    elif "FreeOffsets" in obj:
-        setattr(obj, "free", tuple())
-        offsets = obj["FreeOffsets"]
-        bytescounts = obj["FreeByteCounts"]
-        if isinstance(offsets, tuple):
-            data = zip(offsets, bytescounts)
-        else:
-            data = ((offsets, bytescounts), )
-        for offset, bytecount in data:
-            fileobj.seek(offset)
-            obj.free += (fileobj.read(bytecount), )
-    # tiled raster data
-    elif "TileOffsets" in obj:
-        setattr(obj, "tiles", tuple())
-        offsets = obj["TileOffsets"]
-        bytescounts = obj["TileByteCounts"]
-        if isinstance(offsets, tuple):
-            data = zip(offsets, bytescounts)
+# raster data attribute name with its offsets and bytecounts tags, in the
+# order they are looked for
+_RASTERS = (
+    ("stripes", "StripOffsets", "StripByteCounts"),
+    ("free", "FreeOffsets", "FreeByteCounts"),
+    ("tiles", "TileOffsets", "TileByteCounts"),
+)
+
+
+#: Raster chunks closer than `READ_GAP` bytes in file are read at once, with
+#: reads not exceeding `READ_SIZE` bytes
+READ_GAP = 4096
+READ_SIZE = 4 * 2**20
+
+
+def _plan_reads(offsets, bytecounts, gap, size=None, sort=True):
+    # merge (index, offset, bytecount) chunks into (start, end, chunks)
+    # reads, sorted by offset or following chunk order
+    size = READ_SIZE if size is None else size
+    chunks = list(zip(range(len(offsets)), offsets, bytecounts))
+    if sort:
+        chunks.sort(key=lambda chunk: chunk[1])
+    reads = []
+    for chunk in chunks:
+        index, offset, bytecount = chunk
+        if len(reads):
+            start, end, group = reads[-1]
+            stop = max(end, offset + bytecount)
+            if start <= offset <= end + gap and stop - start <= size:
+                reads[-1] = (start, stop, group)
+                group.append(chunk)
+                continue
+        reads.append((offset, offset + bytecount, [chunk]))
+    return reads
+
+
+def _read_chunks(fileobj, offsets, bytecounts, gap=None, sort=False):
+    # yield index, offset and data of raster chunks, near chunks being read
+    # at once and sliced from the buffer
+    if isinstance(fileobj, mmap.mmap):
+        for index, (offset, bytecount) in enumerate(zip(offsets, bytecounts)):
+            yield index, offset, _read_at(fileobj, offset, bytecount)
+        return
+    for start, end, chunks in _plan_reads(
+        offsets, bytecounts, READ_GAP if gap is None else gap, sort=sort
+    ):
+        data = _read_at(fileobj, start, end - start)
+        if len(chunks) == 1:
+            index, offset, bytecount = chunks[0]
+            yield index, offset, data
         else:
-            data = ((offsets, bytescounts), )
-        for offset, bytecount in data:
-            fileobj.seek(offset)
-            obj.tiles += (fileobj.read(bytecount), )
+            # slices share the read buffer instead of copying it
+            data = memoryview(data)
+            for index, offset, bytecount in chunks:
+                yield index, offset, \
+                    data[offset - start:offset - start + bytecount]
+
+
+# for speed reason : load raster only if asked or if needed
+def _load_raster(obj, fileobj, gap=None):
+    # striped, free or tiled raster data, read in file order
+    name, offsets, bytecounts = obj._raster_layout()
+    if name is not None:
+        # loaded chunks are bytes not keeping the whole read buffer alive,
+        # only memory map slices are kept as memoryview
+        mapped = isinstance(fileobj, mmap.mmap)
+        chunks = [None] * len(offsets)
+        for index, offset, data in _read_chunks(
+            fileobj, offsets, bytecounts, gap, sort=True
+        ):
+            chunks[index] = data if mapped else bytes(data)
+        setattr(obj, name, tuple(chunks))
     # get interExchange (thumbnail data for JPEG/EXIF data)
     if "JPEGInterchangeFormat" in obj:
-        fileobj.seek(obj["JPEGInterchangeFormat"])
-        obj.jpegIF = fileobj.read(obj["JPEGInterchangeFormatLength"])
+        obj.jpegIF = _read_at(
+            fileobj, obj["JPEGInterchangeFormat"],
+            obj["JPEGInterchangeFormatLength"]
+        )
 
 
 def getModelTiePoints(cls):
@@ -327,6 +639,38 @@ def getModelTiePoints(cls):
     return getattr(cls, "_model_tiepoints")
 
 
+def getGeokeyDirectory(cls):
+    """
+    Return GeoKey directory parsed from GeoTIFF tags. The directory is
+    created in private attribute `_gkd` on first call and dropped when a
+    GeoTIFF tag is set or deleted. Modified GeoKeys are written back to
+    GeoTIFF tags on save.
+
+    Arguments:
+        cls (Tyf.ifd.Ifd): image file directory
+    Returns:
+        `Tyf.gkd.Gkd`
+    """
+    if not hasattr(cls, "_gkd"):
+        from Tyf import gkd
+        setattr(cls, "_gkd", gkd.Gkd.from_ifd(cls))
+    return getattr(cls, "_gkd")
+
+
+def setGeokeyDirectory(cls, value):
+    value.dirty = True
+    setattr(cls, "_gkd", value)
+
+
+# private attributes computed from tag values
+_CACHED = {
+    "ModelTiepointTag": "_model_tiepoints",
+    "GeoKeyDirectoryTag": "_gkd",
+    "GeoDoubleParamsTag": "_gkd",
+    "GeoAsciiParamsTag": "_gkd",
+}
+
+
 class Ifd(dict):
     """
     Provide a very similar python `dict` interface to create and store IFD tags
@@ -366,6 +710,12 @@ class Ifd(dict):
         lambda cls: getModelTiePoints(cls),
         None, None, ""
     )
+    #: Geotiff GeoKey directory
+    gkd = property(
+        lambda cls: getGeokeyDirectory(cls),
+        lambda cls, value: setGeokeyDirectory(cls, value),
+        None, ""
+    )
 
     def __init__(self, **kwargs):
         dict.__init__(self)
@@ -376,89 +726,251 @@ class Ifd(dict):
     def __delattr__(self, attr):
         if attr == "gpsT":
             dict.pop(self, "GPS IFD", False)
+            getattr(self, "_index", {}).pop("GPS IFD", False)
         elif attr == "exfT":
             dict.pop(self, "Exif IFD", False)
+            getattr(self, "_index", {}).pop("Exif IFD", False)
         elif attr == "itrT":
             dict.pop(self, "Interoperability IFD", False)
+            getattr(self, "_index", {}).pop("Interoperability IFD", False)
         dict.__delattr__(self, attr)
 
+    def __contains__(self, key):
+        return \
+            dict.__contains__(self, key) or \
+            key in getattr(self, "_index", {})
+
+    def __len__(self):
+        self._fetch_all()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._fetch_all()
+        return dict.keys(self)
+
+    def values(self):
+        self._fetch_all()
+        return dict.values(self)
+
+    def items(self):
+        self._fetch_all()
+        return dict.items(self)
+
     def __setitem__(self, tag, value):
+        self._changed(tags.lookup(tag)[1][0])
         try:
             self.get(tag).value = value
         except KeyError:
             self.append(Tag(tag, value))
 
     def __getitem__(self, tag):
-        tag, (key, typ, default, comment) = tags.get(tag)
-        if key in self:
-            return dict.__getitem__(self, key).value
-        for name in ["exfT", "gpsT", "itrT"]:
-            if hasattr(self, name):
-                dic = getattr(self, name)
-                if key in dic:
-                    return dict.__getitem__(dic, key).value
-        raise KeyError("%s tag not found" % key)
+        tag, (key, typ, default, comment), family = tags.lookup(tag)
+        ifd = self._locate(key, family)
+        if ifd is None:
+            raise KeyError("%s tag not found" % key)
+        return dict.__getitem__(ifd, key).value
 
     def __delitem__(self, tag):
-        tag, (key, typ, default, comment) = tags.get(tag)
-        if key in self:
-            return dict.__delitem__(self, key)
-        for name in ["exfT", "gpsT", "itrT"]:
-            if hasattr(self, name):
-                dic = getattr(self, name)
-                if key in dic:
-                    if len(dic) == 1:
-                        delattr(self, name)
-                    return dict.__delitem__(dic, key)
-        raise KeyError("%s tag not found" % key)
+        tag, (key, typ, default, comment), family = tags.lookup(tag)
+        ifd = self._locate(key, family)
+        if ifd is None:
+            raise KeyError("%s tag not found" % key)
+        self._changed(key)
+        if ifd is not self and len(ifd) == 1:
+            delattr(self, family)
+        return dict.__delitem__(ifd, key)
 
     def set(self, tag, typ, value):
         tag = Tag(tag)
         tag.type = typ
         tag.value = value
+        getattr(self, "_index", {}).pop(tag.key, None)
+        self._changed(tag.key)
         return dict.__setitem__(self, tag.key, tag)
 
     def get(self, tag, default=None):
-        tag, (key, typ, default, comment) = tags.get(tag)
-        if key in self:
-            return dict.get(self, key, default)
-        for name in ["exfT", "gpsT", "itrT"]:
-            if hasattr(self, name):
-                dic = getattr(self, name)
-                if key in dic:
-                    return dict.get(dic, key, default)
-        raise KeyError("%s tag not found" % key)
+        tag, (key, typ, _, comment), family = tags.lookup(tag)
+        ifd = self._locate(key, family)
+        if ifd is None:
+            raise KeyError("%s tag not found" % key)
+        return dict.get(ifd, key, default)
 
     def pop(self, tag, default=None):
-        tag, (key, typ, default, comment) = tags.get(tag)
-        if key in self:
-            return dict.pop(self, key)
-        for name in ["exfT", "gpsT", "itrT"]:
-            if hasattr(self, name):
-                dic = getattr(self, name)
-                if key in dic:
-                    result = dict.pop(dic, key)
-                    if len(dic) == 0:
-                        delattr(self, name)
-                    return result
-        return default
+        tag, (key, typ, _, comment), family = tags.lookup(tag)
+        ifd = self._locate(key, family)
+        if ifd is None:
+            return default
+        self._changed(key)
+        result = dict.pop(ifd, key)
+        if ifd is not self and len(ifd) == 0:
+            delattr(self, family)
+        return result
 
-    def append(self, tag):
+    def _locate(self, key, family):
+        # return the [SUB]IFD containing key according to tag family
+        self._fetch(key, family)
+        if dict.__contains__(self, key):
+            return self
+        ifd = getattr(self, family, None) if family else None
+        if ifd is not None and dict.__contains__(ifd, key):
+            return ifd
+
+    def _route(self, tag, key):
+        # return the [SUB]IFD where tag has to be stored
         for dic in self.tag_family:
-            if tag.tag in dic:
-                return dict.__setitem__(self, tag.key, tag)
-        for name in ["exfT", "gpsT", "itrT"]:
-            dic = getattr(tags, "_" + name, {})
-            if tag.key in dic:
-                if not hasattr(self, name):
-                    setattr(self, name, Ifd(tag_family=[getattr(tags, name)]))
-                return dict.__setitem__(getattr(self, name), tag.key, tag)
+            if tag in dic:
+                return self
+        family = tags.lookup(key)[-1]
+        if family is not None:
+            if not hasattr(self, family):
+                setattr(self, family, Ifd(tag_family=[getattr(tags, family)]))
+            return getattr(self, family)
+
+    def append(self, tag):
+        ifd = self._route(tag.tag, tag.key)
+        if ifd is not None:
+            getattr(ifd, "_index", {}).pop(tag.key, None)
+            self._changed(tag.key)
+            return dict.__setitem__(ifd, tag.key, tag)
+
+    def _changed(self, key):
+        # drop values computed from a tag that is set or deleted
+        self.__dict__.pop(_CACHED.get(key), None)
+
+    def _register(self, entry, source, byteorder="<"):
+        # store unpacked IFD entry in lazy index, tag value is read from
+        # source on first access
+        if not hasattr(self, "_index"):
+            self._index = {}
+        tag, (key, typ, default, comment), family = tags.lookup(entry[0])
+        ifd = self._route(tag, key)
+        if ifd is not None:
+            if not hasattr(ifd, "_index"):
+                ifd._index = {}
+            ifd._index[key] = entry
+            ifd._source = (source, byteorder)
+
+    def _fetch(self, key, family=None):
+        # build tag from lazy index if not already done
+        if not hasattr(self, "_index"):
+            return
+        for ifd in [self, getattr(self, family, None) if family else None]:
+            index = getattr(ifd, "_index", {})
+            if key in index:
+                entry, byteorder = index.pop(key), ifd._source[-1]
+                # inline value is decoded from entry without reading source
+                if _is_inline(entry, byteorder):
+                    tag = Tag.from_entry(entry, byteorder)
+                else:
+                    with ifd._source_file() as fileobj:
+                        tag = Tag.from_entry(entry, byteorder, fileobj)
+                return dict.__setitem__(ifd, key, tag)
+
+    def _fetch_all(self):
+        # build all tags from lazy index, source is opened only if some
+        # values are out of entries
+        index = getattr(self, "_index", {})
+        if len(index):
+            byteorder = self._source[-1]
+            for key, entry in list(index.items()):
+                if _is_inline(entry, byteorder):
+                    del index[key]
+                    dict.__setitem__(
+                        self, key, Tag.from_entry(entry, byteorder)
+                    )
+        if len(index):
+            with self._source_file() as fileobj:
+                while len(index):
+                    key, entry = index.popitem()
+                    dict.__setitem__(
+                        self, key, Tag.from_entry(entry, byteorder, fileobj)
+                    )
+
+    @contextlib.contextmanager
+    def _source_file(self):
+        # open source file if only its path is known
+        source = self._source[0]
+        fileobj = source if hasattr(source, "read") else io.open(source, "rb")
+        try:
+            yield fileobj
+        finally:
+            if fileobj is not source:
+                fileobj.close()
+
+    def _raster_layout(self):
+        # return raster attribute name, offsets and bytecounts in source
+        # file. It is kept on first call because saving the IFD overwrites
+        # offsets tags with destination ones.
+        if not hasattr(self, "_layout"):
+            for name, offsets, bytecounts in _RASTERS:
+                if offsets in self:
+                    offsets, bytecounts = self[offsets], self[bytecounts]
+                    if not isinstance(offsets, (tuple, array.array)):
+                        offsets, bytecounts = (offsets, ), (bytecounts, )
+                    self._layout = (name, offsets, bytecounts)
+                    break
+            else:
+                return (None, (), ())
+        return self._layout
+
+    def _iter_raster(self, name, gap=None):
+        # yield raster chunks from memory if loaded else from source file
+        kind, offsets, bytecounts = self._raster_layout()
+        if kind != name:
+            return
+        if len(getattr(self, name, ())):
+            for index, (offset, data) in enumerate(
+                zip(offsets, getattr(self, name))
+            ):
+                yield index, offset, data
+        elif hasattr(self, "_source"):
+            with self._source_file() as fileobj:
+                for chunk in _read_chunks(fileobj, offsets, bytecounts, gap):
+                    yield chunk
+
+    def iter_strips(self, gap=None):
+        """
+        Return iterator over strips of raster data without loading the whole
+        raster. If raster is not loaded, strips are read from source file,
+        consecutive strips closer than `gap` bytes being read at once and
+        yielded as `memoryview` slices of the read buffer (or of the memory
+        map).
+
+        ```python
+        >>> for index, offset, data in tif[0].iter_strips():
+        ...     print(index, offset, len(data))
+        0 8 10000
+        1 10008 10000
+        ...
+        ```
+
+        Arguments:
+            gap (int): maximum byte gap between strips read at once, default
+                       to `Tyf.ifd.READ_GAP`
+        Returns:
+            iterator over (index, offset in source file, data) tuples
+        """
+        return self._iter_raster("stripes", gap)
+
+    def iter_tiles(self, gap=None):
+        """
+        Return iterator over tiles of raster data without loading the whole
+        raster (see `Tyf.ifd.Ifd.iter_strips`).
+
+        Arguments:
+            gap (int): maximum byte gap between tiles read at once, default
+                       to `Tyf.ifd.READ_GAP`
+        Returns:
+            iterator over (index, offset in source file, data) tuples
+        """
+        return self._iter_raster("tiles", gap)
 
     def tags(self):
         """
         Return iterator over all IFD values including sub IFD ones in the
         order: `exfT` - `gpsT` - `itrT`.
         """
+        self._fetch_all()
         for v in sorted(dict.values(self), key=lambda e: e.tag):
             yield v
         for name in ["exfT", "gpsT", "itrT"]:
@@ -467,18 +979,22 @@ class Ifd(dict):
                     yield v
     __iter__ = tags
 
-    def pack(self, byteorder):
+    def pack(self, byteorder, bigtiff=False):
         result = {}
 
         for name in [n for n in ["exfT", "gpsT", "itrT"] if hasattr(self, n)]:
-            result[name] = getattr(self, name).pack(byteorder)["root"]
+            result[name] = getattr(self, name).pack(byteorder, bigtiff)["root"]
 
         tags = [
-            t.pack(byteorder) for t in
+            t.pack(byteorder, bigtiff) for t in
             sorted(self.values(), key=lambda e: e.tag)
         ]
 
-        ifd_size = struct.calcsize("=H" + len(tags) * "HHLL" + "L")
+        _cnt, _entry, _ofs = IFD_FORMATS[bigtiff]
+        ifd_size = \
+            _compiled("=" + _cnt).size + \
+            len(tags) * _entry_struct("=", bigtiff).size + \
+            _compiled("=" + _ofs).size
         ifd_data = b"".join(t[1] for t in tags if t[-1])
 
         raster_length = set([
@@ -490,8 +1006,9 @@ class Ifd(dict):
             tag = list(raster_length)[0]
             raster_length = self[tag]
             ifd_raster_size = \
-                reduce(int.__add__, raster_length) \
-                if isinstance(raster_length, tuple) else raster_length
+                sum(raster_length) \
+                if isinstance(raster_length, (tuple, array.array)) else \
+                raster_length
         else:
             ifd_raster_size = 0
 
@@ -605,6 +1122,10 @@ class Ifd(dict):
         Returns:
             Image data as `bytes` (py3) or `str` (py2)
         """
+        try:
+            from urllib.request import urlopen
+        except ImportError:
+            from urllib import urlopen
         lon, lat, alt = self.get_location()
         kwargs.update(lon=lon, lat=lat, alt=alt)
         try:
@@ -629,8 +1150,15 @@ class Ifd(dict):
         with io.open(name, "wb") as fileobj:
             fileobj.write(self.url_load_location(url, **kwargs))
 
-    def getModelTransformation(self, tie_idx=0):
+    def getModelMatrix(self, tie_idx=0):
         """
+        Return model transformation matrix from `ModelTransformationTag` or
+        from `ModelTiepointTag` and `ModelPixelScaleTag`.
+
+        Arguments:
+            tie_idx (int): tiepoint index to use
+        Returns:
+            GeoKeyModel["ModelTransformationTag"]
         """
         if "ModelTransformationTag" in self:
             matrix = GeoKeyModel["ModelTransformationTag"](
@@ -654,8 +1182,89 @@ class Ifd(dict):
                 0., 0.,  1., 0.,
                 0., 0.,  0., 1.
             )
+        return matrix
+
+    def getModelTransformation(self, tie_idx=0):
+        """
+        Return function transforming raster coordinates to model ones, see
+        `Tyf.ifd.Transform`.
+
+        Arguments:
+            tie_idx (int): tiepoint index to use
+        """
+        matrix = self.getModelMatrix(tie_idx)
         return lambda x, y, z=0., m=matrix: Transform(m, x, y, z)
 
+    def getRasterTransformation(self, tie_idx=0):
+        """
+        Return function transforming model coordinates to raster ones.
+
+        ```python
+        >>> tr = tif[0].getRasterTransformation()
+        >>> tr(-28493.166784412522, 4255884.5438021915)
+        (0.0, 0.0, 0.0)
+        ```
+
+        Arguments:
+            tie_idx (int): tiepoint index to use
+        """
+        matrix = Inverse(self.getModelMatrix(tie_idx))
+        return lambda x, y, z=0., m=matrix: Transform(m, x, y, z)
+
+    def transform(self, x, y, z=None, tie_idx=0, inverse=False):
+        """
+        Transform many raster coordinates to model ones, or model coordinates
+        to raster ones if `inverse` is `True`. See `Tyf.ifd.TransformArray`.
+
+        ```python
+        >>> X, Y, Z = tif[0].transform([0, 514], [0, 515])
+        >>> I, J, K = tif[0].transform(X, Y, inverse=True)
+        ```
+
+        Arguments:
+            x (sequence or buffer): column indexes or model X
+            y (sequence or buffer): row indexes or model Y
+            z (sequence or buffer): altitude values, default to `0.`
+            tie_idx (int): tiepoint index to use
+            inverse (bool): `True` for model to raster transformation
+        Returns:
+            X, Y, Z as `numpy.ndarray` or `array.array`
+        """
+        matrix = self.getModelMatrix(tie_idx)
+        return TransformArray(
+            Inverse(matrix) if inverse else matrix, x, y, z
+        )
+
+    def iter_grid(self, rows=256, tie_idx=0, center=None):
+        """
+        Return iterator over model coordinates of all pixel centres, by
+        blocks of `rows` raster rows. Only one block is in memory at a time.
+
+        ```python
+        >>> for row, X, Y in tif[0].iter_grid(rows=64):
+        ...     # X[i * width + col], Y[i * width + col] is the pixel centre
+        ...     # of raster row `row + i` and column `col`
+        ...     pass
+        ```
+
+        Arguments:
+            rows (int): raster rows per block
+            tie_idx (int): tiepoint index to use
+            center (float): raster offset of pixel centre, default to `0.5`
+                            if raster pixel is area else `0.`
+        Returns:
+            iterator over (first row index, X, Y) tuples
+        """
+        if center is None:
+            raster_type = self.gkd.get("GTRasterTypeGeoKey")
+            center = 0. if raster_type is not None and \
+                raster_type._decode() == 2 else .5
+        matrix = self.getModelMatrix(tie_idx)
+        width, length = self["ImageWidth"], self["ImageLength"]
+        for row in range(0, length, rows):
+            X, Y = _grid(matrix, width, row, min(rows, length - row), center)
+            yield row, X, Y
+
 
 def dump_mapbox_location(
     cls, name, zoom=15, width=400, height=300,
@@ -0,0 +1,211 @@
+# -*- encoding:utf-8 -*-
+"""
+Byte sources reading files through a block aligned LRU cache. TIFF and JPEG
+parsers issue many small seek and read calls, each one becomes a request on
+remote storage. A byte source turns them into a few block aligned reads,
+reading ahead on cache miss so IFD tables and their values usually come
+with the first request.
+
+```python
+>>> from Tyf import source
+>>> src = source.HTTPSource("https://example.com/cog.tif")
+>>> tif = Tyf.open(src, lazy=True)  # or Tyf.open("https://...", lazy=True)
+>>> tif[0]["ImageWidth"]
+10980
+>>> src.requests
+1
+```
+"""
+
+import os
+import io
+import collections
+
+try:
+    from urllib.request import urlopen, Request
+except ImportError:
+    from urllib2 import urlopen, Request
+
+#: cache block size in bytes
+BLOCK_SIZE = 2**14
+#: minimum bytes read from source on cache miss
+READ_AHEAD = 2**16
+#: maximum number of cached blocks
+CACHE_BLOCKS = 64
+
+
+class ByteSource(object):
+    """
+    Read only file object over a random access byte source. Subclasses have
+    to define a `read_range(offset, size)` method returning at most `size`
+    bytes read from `offset`, fewer only at the end of source. Reads smaller
+    than `read_ahead` are served from cached blocks, bigger ones are sent to
+    source as is.
+
+    Arguments:
+        size (int): source size in bytes if known
+        block_size (int): cache block size in bytes
+        read_ahead (int): minimum bytes read from source on cache miss
+        cache_blocks (int): maximum number of cached blocks
+    """
+
+    def __init__(self, size=None, block_size=BLOCK_SIZE, read_ahead=READ_AHEAD,
+                 cache_blocks=CACHE_BLOCKS):
+        self.size = size
+        self.block_size = block_size
+        self.read_ahead = max(read_ahead, block_size)
+        self.cache_blocks = max(cache_blocks, self.read_ahead // block_size)
+        #: number of reads sent to source
+        self.requests = 0
+        self.position = 0
+        self._blocks = collections.OrderedDict()
+        # TiffFile and JpegFile use file object name to read lazy tag values
+        # and raster data later, reading has to go through the cache
+        self.name = self
+
+    def _read(self, offset, size):
+        self.requests += 1
+        return self.read_range(offset, size)
+
+    def _block(self, index):
+        # return cached block, reading it with the next ones on cache miss
+        try:
+            block = self._blocks.pop(index)
+        except KeyError:
+            count = self.read_ahead // self.block_size
+            if self.size is not None:
+                # no need to request anything after the end of source
+                count = min(count, -(-self.size // self.block_size) - index)
+                if count <= 0:
+                    return b""
+            # do not read again blocks already cached
+            for i in range(index + 1, index + count):
+                if i in self._blocks:
+                    count = i - index
+                    break
+            data = self._read(index * self.block_size, count * self.block_size)
+            for i in range(count):
+                self._blocks[index + i] = \
+                    data[i * self.block_size:(i + 1) * self.block_size]
+            block = self._blocks.pop(index)
+            while len(self._blocks) >= self.cache_blocks:
+                self._blocks.popitem(last=False)
+        self._blocks[index] = block
+        return block
+
+    def seek(self, offset, whence=0):
+        if whence == 2:
+            if self.size is None:
+                raise IOError("source size is unknown")
+            offset += self.size
+        elif whence == 1:
+            offset += self.position
+        self.position = offset
+        return offset
+
+    def tell(self):
+        return self.position
+
+    def read(self, size=-1):
+        offset = self.position
+        if size < 0:
+            if self.size is None:
+                raise IOError("source size is unknown")
+            size = self.size - offset
+        if size == 0:
+            return b""
+        elif size >= self.read_ahead:
+            data = self._read(offset, size)
+        else:
+            data = []
+            first = offset // self.block_size
+            for index in range(
+                first, (offset + size - 1) // self.block_size + 1
+            ):
+                block = self._block(index)
+                data.append(block)
+                if len(block) < self.block_size:
+                    break  # end of source
+            start = offset - first * self.block_size
+            data = b"".join(data)[start:start + size]
+        self.position = offset + len(data)
+        return data
+
+    def close(self):
+        "Drop cached blocks, source can still be read afterwards."
+        self._blocks.clear()
+
+
+class FileSource(ByteSource):
+    """
+    Byte source reading a local file, useful on network or FUSE mounts. A
+    file opened from its path is opened again if read after `close`.
+
+    Arguments:
+        f (buffer or string): a valid file path or a python file object
+        **kwargs: `Tyf.source.ByteSource` keyword arguments
+    """
+
+    def __init__(self, f, **kwargs):
+        if hasattr(f, "read"):
+            self.fileobj, self.path = f, None
+        else:
+            self.fileobj, self.path = io.open(f, "rb", buffering=0), f
+        kwargs.setdefault("size", os.fstat(self.fileobj.fileno()).st_size)
+        ByteSource.__init__(self, **kwargs)
+
+    def read_range(self, offset, size):
+        if self.path is not None and self.fileobj.closed:
+            self.fileobj = io.open(self.path, "rb", buffering=0)
+        self.fileobj.seek(offset)
+        return self.fileobj.read(size)
+
+    def close(self):
+        ByteSource.close(self)
+        if self.path is not None:
+            self.fileobj.close()
+
+
+class HTTPSource(ByteSource):
+    """
+    Byte source reading a file over HTTP range requests. Source size is
+    known after the first request. If server does not support range
+    requests, the whole file sent with the first response is kept in memory
+    and no other request is sent.
+
+    Arguments:
+        url (string): file url
+        headers (dict): additional request headers
+        **kwargs: `Tyf.source.ByteSource` keyword arguments
+    """
+
+    def __init__(self, url, headers={}, **kwargs):
+        self.url = url
+        self.headers = dict(headers)
+        self.data = None
+        ByteSource.__init__(self, **kwargs)
+
+    def _read(self, offset, size):
+        if self.data is not None:
+            return self.data[offset:offset + size]
+        return ByteSource._read(self, offset, size)
+
+    def read_range(self, offset, size):
+        headers = dict(
+            self.headers, Range="bytes=%d-%d" % (offset, offset + size - 1)
+        )
+        response = urlopen(Request(self.url, headers=headers))
+        try:
+            data = response.read()
+            # Content-Range: bytes 0-65535/1234567
+            content_range = response.headers.get("Content-Range", "")
+            if "/" in content_range and content_range[-1] != "*":
+                self.size = int(content_range.split("/")[-1])
+            elif response.getcode() == 200:
+                # range not supported, the whole file is sent
+                self.size = len(data)
+                self.data = data
+                data = data[offset:offset + size]
+        finally:
+            response.close()
+        return data
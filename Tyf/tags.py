@@ -198,11 +198,11 @@ pTT = {
     50780:  ("BestQualityScale", [5], None, "Used in Raw IFD of DNG files"),
     50784:  ("Alias Layer Metadata", [2], None, "Alias Sketchbook Pro layer usage description"),
     # XP tags
-    0x9c9b: ("XPTitle", [4], None, ""),
-    0x9c9c: ("XPComment", [4], None, ""),
-    0x9c9d: ("XPAuthor", [4], None, ""),
-    0x9c9e: ("XPKeywords", [4], None, ""),
-    0x9c9f: ("XPSubject", [4], None, ""),
+    0x9c9b: ("XPTitle", [1], None, ""),
+    0x9c9c: ("XPComment", [1], None, ""),
+    0x9c9d: ("XPAuthor", [1], None, ""),
+    0x9c9e: ("XPKeywords", [1], None, ""),
+    0x9c9f: ("XPSubject", [1], None, ""),
     0xea1c: ("Padding", [7], None, ""),
     0xea1d: ("OffsetSchema", [9], None, ""),
 }
@@ -339,15 +339,33 @@ _BY_NAME = dict(
 )
 
 
-def get(tag_or_key):
-    if isinstance(tag_or_key, (bytes, str)):
-        for dic in [_BY_NAME, _exfT, _gpsT, _itrT]:
-            if tag_or_key in dic:
-                tag, types, default, comment = dic[tag_or_key]
-                return tag, (tag_or_key, types, default, comment)
-    else:
-        for dic in [_BY_TAG, exfT, gpsT, itrT]:
-            if tag_or_key in dic:
-                return tag_or_key, dic[tag_or_key]
+#: Unified registry linking tag number and tag name to tag definition and sub
+#: IFD family (`None` for root IFD tags, `"exfT"`, `"gpsT"` or `"itrT"`).
+#: First definition found is kept in this order: baseline/extension/private,
+#: Exif, GPS and Interoperability tags.
+REGISTRY = {}
+for _family, _dic in [
+    (None, _BY_TAG), ("exfT", exfT), ("gpsT", gpsT), ("itrT", itrT)
+]:
+    for _tag, _definition in _dic.items():
+        REGISTRY.setdefault(_tag, (_tag, _definition, _family))
+        REGISTRY.setdefault(_definition[0], (_tag, _definition, _family))
+del _family, _dic, _tag, _definition
+
+
+def lookup(tag_or_key):
+    """
+    Return tag number, tag definition and sub IFD family name.
+    """
+    try:
+        return REGISTRY[tag_or_key]
+    except KeyError:
+        return (
+            False,
+            ("Undefined", [7], None, "Undefined tag %r" % tag_or_key),
+            None
+        )
 
-    return False, ("Undefined", [7], None, "Undefined tag %r" % tag_or_key)
+
+def get(tag_or_key):
+    return lookup(tag_or_key)[:2]
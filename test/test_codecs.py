@@ -0,0 +1,52 @@
+# -*- encoding:utf-8 -*-
+
+import array
+import unittest
+
+from Tyf import ifd, encoders, decoders
+
+
+class XPCodecs(unittest.TestCase):
+
+    def test_round_trip(self):
+        text = u"clé;日本;\U0001d11e music"
+        tag = ifd.Tag("XPKeywords", text)
+        self.assertEqual(tag.type, 1)
+        self.assertEqual(tag.value, text)
+
+    def test_legacy_long_values(self):
+        # former encoder stored one code point and a null per character
+        legacy = (0x65e5, 0, 0x672c, 0, ord(u"a"), 0, 0, 0)
+        self.assertEqual(decoders.XPTitle(legacy), u"日本a")
+        self.assertEqual(
+            decoders.XPTitle(array.array("I", legacy)), u"日本a"
+        )
+        self.assertEqual(decoders.XPTitle((97, 0, 98, 0, 0, 0)), u"ab")
+
+
+class UserCommentCodecs(unittest.TestCase):
+
+    def test_ascii(self):
+        value = encoders.UserComment(u"hello")
+        self.assertEqual(value, b"ASCII\x00\x00\x00hello")
+        self.assertEqual(decoders.UserComment(value + b"\x00"), u"hello")
+
+    def test_unicode(self):
+        value = encoders.UserComment(u"héllo")
+        self.assertEqual(value[:8], b"UNICODE\x00")
+        self.assertEqual(decoders.UserComment(value), u"héllo")
+        big_endian = b"UNICODE\x00" + u"héllo".encode("utf-16-be")
+        self.assertEqual(decoders.UserComment(big_endian), u"héllo")
+
+    def test_unicode_odd_length(self):
+        value = b"UNICODE\x00\xff\xfea\x00b"
+        self.assertEqual(decoders.UserComment(value), u"a")
+
+    def test_jis(self):
+        text = u"abc 日本語"
+        value = b"JIS\x00\x00\x00\x00\x00" + text.encode("iso2022_jp")
+        self.assertEqual(decoders.UserComment(value), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+# -*- encoding:utf-8 -*-
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import Tyf
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _read(path):
+    with io.open(path, "rb") as f:
+        return f.read()
+
+
+class SaveInPlace(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def check(self, name, **kwargs):
+        path = os.path.join(self.tmp, name)
+        shutil.copy(os.path.join(HERE, name), path)
+        expected = os.path.join(self.tmp, "expected_" + name)
+        Tyf.open(path).save(expected)
+        obj = Tyf.open(path, **kwargs)
+        obj.save(path)
+        self.assertEqual(_read(path), _read(expected))
+        # object does not read anything from replaced file
+        other = os.path.join(self.tmp, "other_" + name)
+        obj.save(other)
+        self.assertEqual(_read(other), _read(expected))
+
+    def test_tiff(self):
+        self.check("CEA.tif")
+
+    def test_lazy_tiff(self):
+        self.check("CEA.tif", lazy=True)
+
+    def test_mapped_tiff(self):
+        self.check("CEA.tif", mapped=True)
+
+    def test_jpeg(self):
+        self.check("IMG_20150730_210115.jpg")
+
+    def test_lazy_jpeg(self):
+        self.check("IMG_20150730_210115.jpg", lazy=True)
+
+    def test_mapped_jpeg(self):
+        self.check("IMG_20150730_210115.jpg", mapped=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- encoding:utf-8 -*-
+
+import os
+import re
+import threading
+import unittest
+
+import Tyf
+from Tyf import source
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # serve test files, with range requests support if server `ranges`
+    # attribute is True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with open(os.path.join(HERE, self.path.lstrip("/")), "rb") as f:
+            data = f.read()
+        match = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        self.server.requests += 1
+        if self.server.ranges and match:
+            start, end = [int(e) for e in match.groups()]
+            chunk = data[start:end + 1]
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", "bytes %d-%d/%d" % (
+                    start, start + len(chunk) - 1, len(data)
+                )
+            )
+        else:
+            chunk = data
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(chunk)))
+        self.end_headers()
+        self.wfile.write(chunk)
+
+
+class HTTPSourceTest(unittest.TestCase):
+
+    ranges = True
+
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.ranges = self.ranges
+        self.server.requests = 0
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = "http://127.0.0.1:%d/" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def read(self, name):
+        remote = Tyf.open(self.url + name, lazy=True)
+        local = Tyf.open(os.path.join(HERE, name), lazy=True)
+        self.assertEqual(
+            [sorted((t.key, repr(t.value)) for t in i.tags()) for i in remote],
+            [sorted((t.key, repr(t.value)) for t in i.tags()) for i in local]
+        )
+        remote.load_raster()
+        local.load_raster()
+        self.assertEqual(
+            [bytes(chunk) for i in remote for chunk in i.stripes],
+            [bytes(chunk) for i in local for chunk in i.stripes]
+        )
+        return remote
+
+    def test_tiff(self):
+        self.read("uint16.tif")
+        # IFD, values and raster are read with a few block aligned reads
+        self.assertTrue(self.server.requests <= 3)
+
+    def test_jpeg(self):
+        src = source.HTTPSource(self.url + "IMG_TEST_001.jpg")
+        jpg = Tyf.open(src, lazy=True)
+        local = Tyf.open(os.path.join(HERE, "IMG_TEST_001.jpg"))
+        self.assertEqual(jpg.ifd0["Model"], local.ifd0["Model"])
+        self.assertEqual(src.requests, self.server.requests)
+
+
+class HTTPSourceNoRangeTest(HTTPSourceTest):
+
+    ranges = False
+
+    def test_tiff(self):
+        self.read("uint16.tif")
+        # whole file is sent with first response and kept
+        self.assertEqual(self.server.requests, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()